@@ -0,0 +1,90 @@
+# Position evaluation for hints and the analysis endpoint.
+#
+# For the side to move, every empty cell is scored win/draw/loss with the
+# number of plies to that result, using the solved 3x3 table. Results are
+# kept in a bounded LRU keyed by the canonical position, so all games that
+# reach the same opening (in any rotation or reflection) share one entry;
+# cells are stored in canonical orientation and mapped back per request.
+
+from collections import OrderedDict
+
+import engine
+import solver
+
+RESULTS = {1: 'win', 0: 'draw', -1: 'loss'}
+
+
+class LRUCache:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class Analyzer:
+    def __init__(self, table, capacity=4096):
+        self.table = table
+        self.cache = LRUCache(capacity)
+
+    def _evaluate(self, key):
+        # Scores each empty cell of the canonical position `key`
+        x, o = key >> solver.CELLS, key & ((1 << solver.CELLS) - 1)
+        x_to_move = x.bit_count() == o.bit_count()
+        filled = x | o
+        scored = []
+        for cell in range(solver.CELLS):
+            if filled >> cell & 1:
+                continue
+            bit = 1 << cell
+            value, distance, _ = solver.lookup(self.table, x | bit, o) if x_to_move \
+                else solver.lookup(self.table, x, o | bit)
+            # Child values are for the opponent, one ply further on
+            scored.append((cell, -value, distance + 1))
+        return tuple(scored)
+
+    def analyze(self, rules, bits):
+        # Returns a list of {row, col, result, distance} for the side to move,
+        # or None when the board has no solved table
+        if rules is not engine.STANDARD:
+            return None
+        key, sym = solver.canonical(bits[0], bits[1])
+        scored = self.cache.get(key)
+        if scored is None:
+            scored = self._evaluate(key)
+            self.cache.put(key, scored)
+        inverse = solver.INVERSE[sym]
+        cells = []
+        for cell, value, distance in scored:
+            r, c = divmod(inverse[cell], rules.size)
+            cells.append({'row': r, 'col': c, 'result': RESULTS[value], 'distance': distance})
+        cells.sort(key=lambda e: (e['row'], e['col']))
+        return cells
@@ -1,11 +1,30 @@
 import os, json
+import atexit
+import argparse
 from flask import Flask, render_template_string, request, redirect, url_for, session
 from flask_socketio import SocketIO, join_room, leave_room, emit
 import random
 import string
 from datetime import timedelta
 import time
-from collections import defaultdict
+import functools
+
+import analysis
+import cluster
+import connections
+import engine
+import gamelocks
+import gamestate
+import matchlog
+import matchmaking
+import ratelimit
+import replay
+import search
+import solver
+import spectators
+import storage
+import timerwheel
+import wire
 
 app = Flask(__name__, instance_relative_config=True)
 # Ensure instance folder exists
@@ -27,67 +46,475 @@ def save_users(users):
 app.secret_key = 'your_secret_key_here'  # change this in production
 app.permanent_session_lifetime = timedelta(minutes=30)
 
-# Socket.IO setup
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', ping_timeout=60, ping_interval=25)
+# Socket.IO setup. OX_ASYNC_MODE picks how handlers run: green threads on
+# eventlet (default) or gevent, or OS threads with 'threading'. Flask-SocketIO
+# has no asyncio mode, as its handlers are Flask views. bench/bench_async.py
+# plays games over websockets on each of them; gevent needs the gevent
+# package installed
+ASYNC_MODES = ('eventlet', 'gevent', 'threading')
+ASYNC_MODE = os.environ.get('OX_ASYNC_MODE', 'eventlet')
+if ASYNC_MODE not in ASYNC_MODES:
+    raise ValueError(f'OX_ASYNC_MODE must be one of {", ".join(ASYNC_MODES)}, not {ASYNC_MODE!r}')
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE, ping_timeout=60, ping_interval=25,
+                    json=wire)
+
+# Games, chat, player stats and connected clients: memory (default), sqlite or redis://
+# Each game keeps its last OX_CHAT_LIMIT chat messages; joining sends the last CHAT_BACKLOG
+CHAT_LIMIT = int(os.environ.get('OX_CHAT_LIMIT', storage.CHAT_LIMIT))
+CHAT_BACKLOG = min(50, CHAT_LIMIT)
+store = storage.open_store(os.environ.get('OX_STORE', 'memory'), app.instance_path, CHAT_LIMIT,
+                           gamelocks.lock_factory(socketio.server.async_mode))
+# Each game's events are handled one at a time; different games never wait on each other
+game_locks = gamelocks.GameLocks(gamelocks.lock_factory(socketio.server.async_mode))
+# Random-opponent queues, rated from the player table
+matchmaker = matchmaking.Matchmaker()
+# Held around each pairing and claim: with OS threads two requests could otherwise take the same waiter
+matching = gamelocks.lock_factory(socketio.server.async_mode)()
+ratings = matchmaking.Ratings(os.path.join(app.instance_path, 'ox_app.db'))
+# Finished rounds go to the match table from a writer thread, never from the move path
+match_log = matchlog.MatchLog(os.environ.get('OX_MATCH_DB', os.path.join(app.instance_path, 'ox_app.db')))
+atexit.register(match_log.close)
+matchmaking_sweeper = None
+# Every running clock of timed and blitz games, flagged by one background task
+clock_wheel = timerwheel.TimerWheel(time.time())
+clock_driver = None
+# Games idle this long are evicted with their chat; games nobody is seated in go sooner
+GAME_TTL = int(os.environ.get('OX_GAME_TTL', 30 * 60))
+EMPTY_GAME_TTL = 60
+SWEEP_INTERVAL = 5
+SWEEP_BATCH = 100
+expiry = timerwheel.TimerWheel(time.time(), tick=1.0)
+expiry_sweeper = None
+eviction_stats = {'sweeps': 0, 'evicted': 0, 'kept_watched': 0}
+# The game, role and name each socket holds (see connections.py). A seat whose
+# sockets have all dropped is freed by the expiry sweeper after SEAT_GRACE
+# seconds unless a socket resumes it first
+SEAT_GRACE = float(os.environ.get('OX_SEAT_GRACE', 30))
+connected = connections.Connections()
+departures = timerwheel.TimerWheel(time.time(), tick=1.0)
+# Per-sid and per-game token buckets for client events ({rate per second, burst});
+# OX_RATE_LIMITS replaces them with its own JSON, and '{}' turns limiting off
+RATE_LIMITS = {
+    'make_move': {'sid': [5, 10], 'room': [20, 40]},
+    'send_chat': {'sid': [1, 5], 'room': [5, 20]},
+    'request_state': {'sid': [2, 5], 'room': [20, 40]},
+    'request_reset': {'sid': [1, 3], 'room': [2, 5]},
+    'request_hint': {'sid': [1, 3]},
+    'join_game': {'sid': [2, 5]},
+}
+rate_limiter = ratelimit.RateLimiter(json.loads(os.environ['OX_RATE_LIMITS'])
+                                     if 'OX_RATE_LIMITS' in os.environ else RATE_LIMITS)
 
-# Game data storage
-games = {}
-chat_messages = defaultdict(list)
-player_stats = defaultdict(lambda: {'wins': 0, 'losses': 0, 'ties': 0, 'games_played': 0})
-active_players = set()
-waiting_player = None
+# Perfect-play table for the vs computer mode, solved once and cached in instance/
+solution_table = solver.load_or_build(os.path.join(app.instance_path, 'solution_table.json'))
+# Bigger boards are searched in worker processes, never on the server's own threads
+search_pool = search.SearchPool()
+# Per-cell hint evaluations, shared across games through a canonical-position LRU
+analyzer = analysis.Analyzer(solution_table, capacity=int(os.environ.get('OX_ANALYSIS_CACHE', 4096)))
+# How often a game_update was served from a game's cached encoding
+snapshot_stats = {'encoded': 0, 'reused': 0}
+# The last few game_deltas of each game, replayed to clients resuming after a drop
+replays = replay.Replays(int(os.environ.get('OX_REPLAY_LIMIT', replay.REPLAY_LIMIT)))
+# Sockets that negotiated MessagePack; everyone else gets JSON
+binary_clients = set()
+# Sockets that asked for the online count with subscribe_presence. Connects
+# and disconnects only mark the count dirty; one task sends it to this room
+# at most once per interval, and only when it changed
+PRESENCE_ROOM = 'presence'
+PRESENCE_INTERVAL = float(os.environ.get('OX_PRESENCE_INTERVAL', 2))
+presence = {'dirty': False, 'sent': None, 'changes': 0, 'broadcasts': 0}
+presence_task = None
+# Who is spectating which game (see spectators.py). Saves mark a watched game
+# stale; one task sends each stale game's snapshot to its watch room at most
+# once per interval, and changed viewer counts to players and watchers alike
+SPECTATOR_INTERVAL = float(os.environ.get('OX_SPECTATOR_INTERVAL', 0.5))
+viewers = spectators.Viewers()
+spectator_task = None
+# This process's place in a multi-worker deployment (see cluster.py), or None
+worker = None
+# Socket.IO client options shared by every page
+app.jinja_env.globals['io_options'] = {}
 
 def generate_game_id():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
 
-def check_winner(board):
-    # Check rows
-    for row in range(3):
-        if board[row][0] == board[row][1] == board[row][2] and board[row][0] != ' ':
-            return board[row][0], [(row, 0), (row, 1), (row, 2)]
-    
-    # Check columns
-    for col in range(3):
-        if board[0][col] == board[1][col] == board[2][col] and board[0][col] != ' ':
-            return board[0][col], [(0, col), (1, col), (2, col)]
-    
-    # Check diagonals
-    if board[0][0] == board[1][1] == board[2][2] and board[0][0] != ' ':
-        return board[0][0], [(0, 0), (1, 1), (2, 2)]
-    if board[0][2] == board[1][1] == board[2][0] and board[0][2] != ' ':
-        return board[0][2], [(0, 2), (1, 1), (2, 0)]
-    
-    # Check for tie
-    if all(cell != ' ' for row in board for cell in row):
-        return 'Tie', []
-    
-    return None, []
+def _save(game):
+    # Every save is activity, and pushes back the game's eviction
+    game.last_active = time.time()
+    store.save_game(game)
+    viewers.changed(game.game_id)
+    expiry.schedule(game.game_id, game.last_active + (GAME_TTL if game.seats else EMPTY_GAME_TTL))
+    _start_expiry_sweeper()
+
+def _start_expiry_sweeper():
+    # One task evicts every idle game, a batch at a time
+    global expiry_sweeper
+    if expiry_sweeper is not None:
+        return
+
+    def sweep():
+        # Games saved by an earlier run get a full TTL from now
+        for game_id in store.game_ids():
+            if game_id not in expiry:
+                expiry.schedule(game_id, time.time() + GAME_TTL)
+        while True:
+            socketio.sleep(SWEEP_INTERVAL)
+            due = expiry.advance(time.time())
+            eviction_stats['sweeps'] += 1
+            for start in range(0, len(due), SWEEP_BATCH):
+                for game_id in due[start:start + SWEEP_BATCH]:
+                    _expire(game_id)
+                socketio.sleep(0)
+            for game_id, player in departures.advance(time.time()):
+                _depart(game_id, player)
+
+    expiry_sweeper = socketio.start_background_task(sweep)
+
+def _expire(game_id):
+    with game_locks(game_id):
+        game = store.get_game(game_id)
+        if game is not None:
+            ttl = GAME_TTL if game.seats else EMPTY_GAME_TTL
+            idle = time.time() - game.last_active
+            if idle < ttl:
+                # Saved since, possibly by another worker
+                expiry.schedule(game_id, game.last_active + ttl)
+                return
+            if game.seats and (_watched(game_id) or viewers.count(game_id)):
+                # A player's or spectator's page is still connected here, just quiet
+                eviction_stats['kept_watched'] += 1
+                _save(game)
+                return
+            if worker is not None and worker.owner(game_id) != worker.index and idle < 2 * ttl:
+                # Only the owner sees the game's sockets; it re-saves watched games every TTL
+                expiry.schedule(game_id, game.last_active + 2 * ttl)
+                return
+            _cancel_search(game)
+            clock_wheel.cancel(game_id)
+            store.delete_game(game_id)
+            eviction_stats['evicted'] += 1
+        store.clear_chat(game_id)
+    game_locks.discard(game_id)
+    rate_limiter.forget_room(game_id)
+    replays.discard(game_id)
+
+def _depart(game_id, player):
+    # Every socket on this seat dropped SEAT_GRACE ago and none came back
+    if connected.holders(game_id, player):
+        return
+    with game_locks(game_id):
+        game = store.get_game(game_id)
+        if game is not None and game.is_seated(player):
+            _unseat(game, player, game.name_of(player))
+
+def _unseat(game, player, player_name):
+    if game.time_controls and not game.winner and len(game.players) == 2:
+        # The clock pauses while a seat is empty
+        _charge_clock(game, time.time())
+    game.unseat(player)
+    _cancel_search(game)
+    _save(game)
+    _run_clock(game)
+
+    # Notify remaining players
+    _broadcast('player_left', {
+        'player': player,
+        'player_name': player_name
+    }, game.game_id)
+
+    _broadcast_chat({
+        'player': 'System',
+        'player_name': 'System',
+        'message': f'{player_name} has left the game'
+    }, game.game_id)
+
+def _take_seat(game, player, player_name):
+    game.seat(player, player_name)
+    if game.time_controls and not game.winner and len(game.players) == 2:
+        # The side to move's clock starts once both seats are filled
+        game.last_move_time = time.time()
+
+def _watched(game_id):
+    rooms = socketio.server.manager.rooms.get('/', {})
+    return bool(rooms.get(game_id) or rooms.get(wire.binary_room(game_id)))
 
 def reset_game(game_id):
-    if game_id in games:
-        games[game_id]['board'] = [[' ', ' ', ' '] for _ in range(3)]
-        games[game_id]['current_player'] = 'X'
-        games[game_id]['winner'] = None
-        games[game_id]['winning_cells'] = []
-        games[game_id]['move_history'] = []
-        games[game_id]['last_move_time'] = time.time()
-
-def _pack_game(game):
+    game = store.get_game(game_id)
+    if game:
+        _cancel_search(game)
+        game.reset()
+        _save(game)
+        _run_clock(game)
+
+def _pack_game(game, binary=False):
+    rules = game.rules
     return {
-        'board': game['board'],
-        'players': game['players'],
-        'current_player': game['current_player'],
-        'winner': game['winner'],
-        'scores': game.get('scores', {'X': 0, 'O': 0}),
-        'winning_cells': game.get('winning_cells', []),
-        'move_history': game.get('move_history', []),
-        'game_start_time': game.get('game_start_time', time.time()),
-        'time_controls': game.get('time_controls', None),
-        'theme': game.get('theme', 'classic'),
-        'game_mode': game.get('game_mode', 'standard'),
-        'player_names': game.get('player_names', {'X': 'Player X', 'O': 'Player O'})
+        'seq': game.seq,
+        'board': rules.to_bytes(game.bits) if binary else rules.to_rows(game.bits),
+        'size': rules.size,
+        'win_length': rules.win_length,
+        'players': game.players,
+        'current_player': game.current_player,
+        'winner': game.winner,
+        'scores': {'X': game.scores[0], 'O': game.scores[1]},
+        'winning_cells': game.winning_cells,
+        'move_history': game.history(),
+        'game_start_time': game.game_start_time,
+        'time_controls': game.time_controls,
+        'theme': game.theme,
+        'game_mode': game.game_mode,
+        'player_names': game.player_names
     }
 
+def _snapshot(game, fmt=wire.JSON):
+    # The game's snapshot encoded once per seq and format, reused until the next change
+    if game.snapshot_seq != game.seq:
+        game.snapshots.clear()
+        game.snapshot_seq = game.seq
+    encoded = game.snapshots.get(fmt)
+    if encoded is None:
+        if fmt == wire.BINARY:
+            encoded = wire.pack(_pack_game(game, binary=True))
+        else:
+            encoded = wire.encode(_pack_game(game))
+        game.snapshots[fmt] = encoded
+        snapshot_stats['encoded'] += 1
+    else:
+        snapshot_stats['reused'] += 1
+    return encoded
+
+def _occupied(room):
+    # Other workers' members are invisible here, so with several workers always emit
+    return worker is not None or bool(socketio.server.manager.rooms.get('/', {}).get(room))
+
+def _game_room(game_id, sid):
+    return wire.binary_room(game_id) if sid in binary_clients else game_id
+
+def _send(event, payload, sid=None):
+    # Emit to one socket in the format it negotiated
+    sid = sid or request.sid
+    socketio.emit(event, wire.pack(payload) if sid in binary_clients else payload, to=sid)
+
+def _broadcast(event, payload, room):
+    # Emit to a room and to its binary twin, encoding each format once
+    socketio.emit(event, payload, room=room)
+    twin = wire.binary_room(room)
+    if _occupied(twin):
+        socketio.emit(event, wire.pack(payload), room=twin)
+
+def _broadcast_chat(record, game_id):
+    # Chat goes to the players and, when there are any, to the spectators
+    _broadcast('chat_message', record, game_id)
+    if viewers.count(game_id):
+        _broadcast('chat_message', record, spectators.watch_room(game_id))
+
+def _send_snapshot(game, sid=None):
+    sid = sid or request.sid
+    socketio.emit('game_update', _snapshot(game, wire.BINARY if sid in binary_clients else wire.JSON), to=sid)
+
+def _broadcast_snapshot(game_id, game):
+    socketio.emit('game_update', _snapshot(game), room=game_id)
+    twin = wire.binary_room(game_id)
+    if _occupied(twin):
+        socketio.emit('game_update', _snapshot(game, wire.BINARY), room=twin)
+
+def _broadcast_delta(game, delta):
+    replays.record(game.game_id, delta['seq'], delta)
+    _broadcast('game_delta', delta, game.game_id)
+
+def _catch_up(game, seq):
+    # A resuming client gets the deltas it missed as one event, or the
+    # snapshot when some of them are no longer kept
+    missed = replays.since(game.game_id, seq, game.seq)
+    if missed is None:
+        _send_snapshot(game)
+    elif missed:
+        _send('game_replay', missed)
+
+def _pack_delta(game, player, cell):
+    # Constant-size update for one move; clients apply it on top of seq - 1
+    r, c = divmod(cell, game.rules.size)
+    delta = {
+        'seq': game.seq,
+        'cell': [r, c],
+        'player': player,
+        'current_player': game.current_player,
+        'winner': game.winner
+    }
+    if game.winner:
+        delta['winning_cells'] = game.winning_cells
+        delta['scores'] = {'X': game.scores[0], 'O': game.scores[1]}
+    if game.time_controls:
+        # A copy, as the recorded delta must not follow the running clock
+        delta['remaining'] = dict(game.time_controls['remaining'])
+    return delta
+
+def _apply_move(game, player, cell):
+    # Apply move and check for winner through the played cell only
+    now = time.time()
+    if game.time_controls:
+        _charge_clock(game, now)
+    game.move_count += 1
+    winner, winning_cells = game.rules.play(game.bits, player, cell, game.move_count)
+    game.record_move(player, cell, now)
+    game.last_move_time = now
+    
+    if winner:
+        game.winner = winner
+        game.winning_cells = winning_cells
+        if winner != 'Tie':
+            game.add_score(winner)
+            
+            # Update player stats
+            winner_name = game.name_of(winner)
+            loser_name = game.name_of('O' if winner == 'X' else 'X')
+            
+            store.record_result(winner_name, 'wins')
+            store.record_result(loser_name, 'losses')
+        else:
+            # Update tie stats
+            store.record_result(game.name_of('X'), 'ties')
+            store.record_result(game.name_of('O'), 'ties')
+        match_log.record(game)
+    else:
+        game.current_player = 'O' if player == 'X' else 'X'
+
+    _save(game)
+    _run_clock(game)
+
+def _charge_clock(game, now):
+    # Debit the side to move for the time since its clock last started
+    remaining = game.time_controls['remaining']
+    player = game.current_player
+    remaining[player] = round(max(0, remaining[player] - (now - game.last_move_time)), 3)
+    game.last_move_time = now
+
+def _clock_left(game, now):
+    return game.time_controls['remaining'][game.current_player] - (now - game.last_move_time)
+
+def _run_clock(game):
+    # Arms the wheel for the side to move, or stops the game's clock. Only
+    # the worker that owns the game runs its clock
+    if not game.time_controls or (worker is not None and worker.owner(game.game_id) != worker.index):
+        return
+    if game.winner or len(game.players) < 2:
+        clock_wheel.cancel(game.game_id)
+        return
+    clock_wheel.schedule(game.game_id, game.last_move_time + game.time_controls['remaining'][game.current_player])
+    _start_clock_driver()
+
+def _start_clock_driver():
+    # One task advances the wheel a tick at a time for every live game
+    global clock_driver
+    if clock_driver is not None:
+        return
+
+    def drive():
+        while True:
+            socketio.sleep(clock_wheel.tick)
+            for game_id in clock_wheel.advance(time.time()):
+                _clock_expired(game_id)
+
+    clock_driver = socketio.start_background_task(drive)
+
+def _clock_expired(game_id):
+    with game_locks(game_id):
+        game = store.get_game(game_id)
+        if not game or not game.time_controls or game.winner or len(game.players) < 2:
+            return
+        if _clock_left(game, time.time()) > 0:
+            # The clock was restarted after this deadline was set
+            _run_clock(game)
+            return
+        _flag(game)
+
+def _flag(game):
+    # Called under the game's lock once the side to move has no time left
+    loser = game.time_out()
+    store.record_result(game.name_of(game.winner), 'wins')
+    store.record_result(game.name_of(loser), 'losses')
+    match_log.record(game)
+    clock_wheel.cancel(game.game_id)
+    _save(game)
+    _broadcast_delta(game, {
+        'seq': game.seq,
+        'timeout': loser,
+        'current_player': game.current_player,
+        'winner': game.winner,
+        'winning_cells': [],
+        'scores': {'X': game.scores[0], 'O': game.scores[1]},
+        'remaining': dict(game.time_controls['remaining'])
+    })
+    _broadcast_chat({
+        'player': 'System',
+        'player_name': 'System',
+        'message': f'{game.name_of(loser)} ran out of time'
+    }, game.game_id)
+
+def _analyze(game_id, game):
+    payload = {
+        'game_id': game_id,
+        'to_move': game.current_player,
+        'cells': [],
+        'cache': analyzer.cache.stats()
+    }
+    if game.winner:
+        payload['message'] = 'Game already ended'
+        return payload
+    cells = analyzer.analyze(game.rules, game.bits)
+    if cells is None:
+        payload['message'] = 'Analysis is only available on the 3x3 board'
+    else:
+        payload['cells'] = cells
+        payload['cache'] = analyzer.cache.stats()
+    return payload
+
+def _computer_reply(game_id):
+    # Answer with the computer's move if it is the computer's turn
+    game = store.get_game(game_id)
+    computer = game and game.computer
+    if not computer or game.winner or game.current_player != computer['player']:
+        return
+    if game.rules is not engine.STANDARD:
+        _start_search(game_id, game)
+        return
+    cell = solver.choose_move(solution_table, game.bits, computer['difficulty'])
+    _apply_move(game, computer['player'], cell)
+    _broadcast_delta(game, _pack_delta(game, computer['player'], cell))
+
+def _start_search(game_id, game):
+    computer = game.computer
+    task = search_pool.submit(game.rules, game.bits, computer['player'],
+                              search.BUDGET.get(computer['difficulty'], search.BUDGET['hard']))
+    if task is None:
+        _broadcast('invalid_move', {'message': 'Computer is busy, try again shortly'}, game_id)
+        return
+    game.search = task
+    socketio.start_background_task(_await_search, game_id, task)
+
+def _await_search(game_id, task):
+    # Polls the worker's future from a green thread and plays its reply
+    while not task.future.done():
+        socketio.sleep(0.02)
+    search_pool.release(task)
+    with game_locks(game_id):
+        game = store.get_game(game_id)
+        if not game or game.search is not task or task.future.cancelled():
+            return
+        game.search = None
+        try:
+            cell = task.future.result()
+        except Exception:
+            return
+        _apply_move(game, game.computer['player'], cell)
+        _broadcast_delta(game, _pack_delta(game, game.computer['player'], cell))
+
+def _cancel_search(game):
+    task = game.search
+    if task:
+        search_pool.cancel(task)
+        game.search = None
+
 @app.route('/')
 def home():
     return render_template_string('''
@@ -444,6 +871,8 @@ def home():
                   <option value="standard">Standard</option>
                   <option value="timed">Timed (60s per move)</option>
                   <option value="blitz">Blitz (10s per move)</option>
+                  <option value="connect4">Connect 4 (7x7, 4 in a row)</option>
+                  <option value="gomoku">Gomoku (15x15, 5 in a row)</option>
                   <option value="ultimate">Ultimate (3D 4x4x4)</option>
                 </select>
               </div>
@@ -477,6 +906,36 @@ def home():
             </form>
             <div class="divider">OR</div>
             
+            <form action="/computer" method="post" id="computerForm">
+              <div class="form-group">
+                <label for="computer_player_name">Your Name</label>
+                <input type="text" id="computer_player_name" name="player_name" placeholder="Enter your name" required>
+              </div>
+              
+              <div class="form-group">
+                <label for="computer_game_mode">Board</label>
+                <select id="computer_game_mode" name="game_mode">
+                  <option value="standard">Standard (3x3)</option>
+                  <option value="connect4">Connect 4 (7x7, 4 in a row)</option>
+                  <option value="gomoku">Gomoku (15x15, 5 in a row)</option>
+                </select>
+              </div>
+              
+              <div class="form-group">
+                <label for="difficulty">Difficulty</label>
+                <select id="difficulty" name="difficulty">
+                  <option value="easy">Easy</option>
+                  <option value="medium">Medium</option>
+                  <option value="hard">Hard</option>
+                </select>
+              </div>
+              
+              <button type="submit" class="btn btn-primary">
+                <i class="fas fa-robot"></i> Play vs Computer
+              </button>
+            </form>
+            <div class="divider">OR</div>
+            
             <form action="/join" method="post" id="joinForm">
               <div class="form-group">
                 <label for="join_player_name">Your Name</label>
@@ -582,7 +1041,7 @@ def home():
       
       <script src="https://cdn.socket.io/4.5.4/socket.io.min.js"></script>
       <script>
-        const socket = io();
+        const socket = io({{ io_options|tojson }});
         
         // Switch between tabs
         function switchTab(tabId) {
@@ -597,7 +1056,8 @@ def home():
           document.getElementById(tabId).classList.add('active');
         }
         
-        // Get online player count
+        // Get online player count (sent only to sockets that subscribe)
+        socket.on('connect', () => socket.emit('subscribe_presence'));
         socket.on('player_count', (count) => {
           document.getElementById('onlineCount').textContent = count;
         });
@@ -651,24 +1111,10 @@ def create_game():
     elif game_mode == 'blitz':
         time_controls = {'per_move': 10, 'remaining': {'X': 10, 'O': 10}}
     
-    games[game_id] = {
-        'board': [[' ', ' ', ' '] for _ in range(3)],
-        'players': ['X'],
-        'player_names': {'X': player_name},
-        'current_player': 'X',
-        'winner': None,
-        'winning_cells': [],
-        'scores': {'X': 0, 'O': 0},
-        'move_history': [],
-        'game_start_time': time.time(),
-        'last_move_time': time.time(),
-        'time_controls': time_controls,
-        'theme': theme,
-        'game_mode': game_mode,
-        'spectators': []
-    }
+    game = gamestate.Game(game_id, game_mode, theme, time_controls)
+    game.seat('X', player_name)
+    _save(game)
     
-    chat_messages[game_id] = []
     session['game_id'] = game_id
     session['player'] = 'X'
     session['player_name'] = player_name
@@ -678,54 +1124,66 @@ def create_game():
 
 @app.route('/random', methods=['POST'])
 def random_match():
-    # Simple matchmaking: store a single waiting player token in memory.
-    global waiting_player
+    # Queue for the nearest-rated opponent in the same mode and theme
+    if worker is not None and worker.index != 0:
+        # The queues live on the first worker; 307 keeps the POST and its form
+        return redirect(f'//{request.host.rsplit(":", 1)[0]}:{worker.port_of(0)}/random', code=307)
     player_name = request.form.get('player_name', '').strip() or 'Player'
+    game_mode = request.form.get('game_mode', 'standard')
+    if game_mode not in ('standard', 'connect4', 'gomoku'):
+        game_mode = 'standard'
+    theme = request.form.get('theme', 'classic')
     # generate a token for this waiting session and store in Flask session
     token = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
     session['random_token'] = token
     session.modified = True
+    _start_matchmaking_sweeper()
 
-    # If there's an existing waiting player who is not this same token -> create a game
-    if waiting_player and not waiting_player.get('matched') and waiting_player.get('token') != token:
-        opponent_name = waiting_player.get('player_name', 'Player X')
-        game_id = generate_game_id()
-        games[game_id] = {
-            'board': [[' ', ' ', ' '] for _ in range(3)],
-            'players': ['X', 'O'],
-            'player_names': {'X': opponent_name, 'O': player_name},
-            'current_player': 'X',
-            'winner': None,
-            'winning_cells': [],
-            'scores': {'X': 0, 'O': 0},
-            'move_history': [],
-            'game_start_time': time.time(),
-            'last_move_time': time.time(),
-            'time_controls': None,
-            'theme': 'classic',
-            'game_mode': 'standard',
-            'spectators': []
-        }
-        # Mark waiting player as matched so their poll will know
-        waiting_player['matched'] = True
-        waiting_player['game_id'] = game_id
-        waiting_player['opponent'] = player_name
-
-        # Set session for the second player (this request)
-        session['game_id'] = game_id
-        session['player'] = 'O'
-        session['player_name'] = player_name
-        return redirect(url_for('game', game_id=game_id))
-
-    # Otherwise become the waiting player and go to the waiting page
-    waiting_player = {
-        'token': token,
-        'player_name': player_name,
-        'matched': False,
-        'game_id': None,
-        'created_at': time.time()
-    }
-    return redirect(url_for('random_wait'))
+    rating = ratings.rating_of(session.get('user') or player_name)
+    with matching:
+        opponent = matchmaker.join(token, player_name, rating, (game_mode, theme))
+        if opponent is None:
+            return redirect(url_for('random_wait'))
+
+        ticket = matchmaker.tickets[token]
+        game_id = _start_matched_game(opponent, ticket)
+        matchmaker.claim(token)
+    # Set session for the second player (this request)
+    session.pop('random_token', None)
+    session['game_id'] = game_id
+    session['player'] = ticket.seat
+    session['player_name'] = player_name
+    return redirect(url_for('game', game_id=game_id))
+
+
+def _start_matched_game(waiting, newcomer):
+    # Creates the game for a pairing and pushes `matched` to whoever is still waiting
+    game_mode, theme = waiting.queue
+    game_id = generate_game_id()
+    game = gamestate.Game(game_id, game_mode, theme)
+    for ticket in (waiting, newcomer):
+        ticket.game_id = game_id
+        game.seat(ticket.seat, ticket.name)
+    _save(game)
+    for ticket in (waiting, newcomer):
+        socketio.emit('matched', {'game_id': game_id}, room=_match_room(ticket.token))
+    return game_id
+
+
+def _start_matchmaking_sweeper():
+    # Pairs waiters whose search windows have widened enough to meet
+    global matchmaking_sweeper
+    if matchmaking_sweeper is not None:
+        return
+
+    def sweep():
+        while True:
+            socketio.sleep(1)
+            with matching:
+                for waiting, newcomer in matchmaker.sweep():
+                    _start_matched_game(waiting, newcomer)
+
+    matchmaking_sweeper = socketio.start_background_task(sweep)
 
 
 @app.route('/random_wait')
@@ -746,15 +1204,43 @@ def random_wait():
         <p>Keep this page open. We'll redirect you automatically when a match is found.</p>
         <p><button id="cancelBtn" class="btn">Cancel and return</button></p>
       </div>
+      <script src="https://cdn.socket.io/4.5.4/socket.io.min.js"></script>
       <script>
-        const interval = setInterval(() => {
-          fetch('/random_status').then(r => r.json()).then(data => {
+        // Claims the match (sets our seat in the session) and goes to the game
+        function claim() {
+          return fetch('/random_status').then(r => r.json()).then(data => {
             if (data && data.matched) {
-              clearInterval(interval);
               window.location.href = '/game/' + data.game_id;
+              return true;
             }
-          }).catch(() => {});
-        }, 1400);
+            return false;
+          }).catch(() => false);
+        }
+
+        // Polling is only the fallback for when the socket cannot connect
+        let interval = null;
+        function startPolling() {
+          if (!interval) {
+            interval = setInterval(() => claim().then(done => done && clearInterval(interval)), 1400);
+          }
+        }
+        function stopPolling() {
+          clearInterval(interval);
+          interval = null;
+        }
+
+        if (typeof io === 'undefined') {
+          startPolling();
+        } else {
+          const socket = io({{ io_options|tojson }});
+          socket.on('connect', () => {
+            stopPolling();
+            socket.emit('wait_for_match');
+          });
+          socket.on('matched', () => claim());
+          socket.on('connect_error', startPolling);
+          socket.on('disconnect', startPolling);
+        }
 
         document.getElementById('cancelBtn').addEventListener('click', () => {
           fetch('/random_cancel', {method: 'POST'}).then(() => {
@@ -766,62 +1252,93 @@ def random_wait():
     ''')
 
 
+def _socket_url(game_id):
+    # The owning worker's private port, so all of a game's sockets share a process
+    if worker is None:
+        return ''
+    return f'//{request.host.rsplit(":", 1)[0]}:{worker.port_of(worker.owner(game_id))}'
+
+
+def _match_room(token):
+    return f'match/{token}'
+
+
 @app.route('/random_status')
 def random_status():
-    # Polled by the waiting player to see if they've been matched.
-    global waiting_player
+    # Claimed by the waiting page once it is pushed `matched` (or polled as a fallback)
     token = session.get('random_token')
     if not token:
         return {'matched': False}
 
-    if waiting_player and waiting_player.get('token') == token and waiting_player.get('matched'):
-        game_id = waiting_player.get('game_id')
-        player_name = waiting_player.get('player_name')
-        # Clear waiting_player so next match can start cleanly
-        waiting_player = None
-        # Set session so the waiting player can join the game as X
-        session.pop('random_token', None)
-        session['game_id'] = game_id
-        session['player'] = 'X'
-        session['player_name'] = player_name
-        session.modified = True
-        return {'matched': True, 'game_id': game_id}
-
-    # If there's a matched waiting_player but token doesn't match, or not matched yet
-    return {'matched': False}
+    with matching:
+        ticket = matchmaker.claim(token)
+    if ticket is None:
+        return {'matched': False}
+    # Set session so the waiting player can join the game in their seat
+    session.pop('random_token', None)
+    session['game_id'] = ticket.game_id
+    session['player'] = ticket.seat
+    session['player_name'] = ticket.name
+    session.modified = True
+    return {'matched': True, 'game_id': ticket.game_id}
 
 
 @app.route('/random_cancel', methods=['POST'])
 def random_cancel():
-    # Cancel the current waiting state for this session if it matches
-    global waiting_player
+    # Cancel the current waiting state for this session
     token = session.get('random_token')
-    if token and waiting_player and waiting_player.get('token') == token:
-        waiting_player = None
+    if token:
+        with matching:
+            matchmaker.cancel(token)
         session.pop('random_token', None)
         session.modified = True
     return redirect(url_for('home'))
 
+@app.route('/computer', methods=['POST'])
+def computer_game():
+    # Single-player game against the solved-table opponent; the human is always X
+    game_id = generate_game_id()
+    player_name = request.form.get('player_name', 'Player X').strip() or 'Player X'
+    difficulty = request.form.get('difficulty', 'hard')
+    if difficulty not in solver.DIFFICULTY:
+        difficulty = 'hard'
+    game_mode = request.form.get('game_mode', 'standard')
+    if game_mode not in ('standard', 'connect4', 'gomoku'):
+        game_mode = 'standard'
+    
+    game = gamestate.Game(game_id, game_mode, computer={'player': 'O', 'difficulty': difficulty})
+    game.seat('X', player_name)
+    game.seat('O', f'Computer ({difficulty})')
+    _save(game)
+    
+    session['game_id'] = game_id
+    session['player'] = 'X'
+    session['player_name'] = player_name
+    return redirect(url_for('game', game_id=game_id))
+
 @app.route('/join', methods=['POST'])
 def join_game():
     game_id = request.form['game_id'].upper().strip()
     player_name = request.form.get('player_name', 'Player O').strip() or 'Player O'
     
-    if game_id in games and len(games[game_id]['players']) < 2:
-        session['game_id'] = game_id
-        session['player'] = 'O'
-        session['player_name'] = player_name
-        games[game_id]['players'].append('O')
-        games[game_id]['player_names']['O'] = player_name
-        return redirect(url_for('game', game_id=game_id))
-    
-    # Check if game exists but is full - offer to spectate
-    if game_id in games:
-        session['game_id'] = game_id
-        session['player'] = 'spectator'
-        session['player_name'] = player_name
-        games[game_id]['spectators'].append(player_name)
-        return redirect(url_for('game', game_id=game_id))
+    with game_locks(game_id):
+        game = store.get_game(game_id)
+        # Whichever seat is free: X's, if its player has left
+        free = [p for p in gamestate.PLAYERS if not game.is_seated(p)] if game else []
+        if free:
+            session['game_id'] = game_id
+            session['player'] = free[0]
+            session['player_name'] = player_name
+            _take_seat(game, free[0], player_name)
+            _save(game)
+            return redirect(url_for('game', game_id=game_id))
+        
+        # Check if game exists but is full - offer to spectate
+        if game:
+            session['game_id'] = game_id
+            session['player'] = 'spectator'
+            session['player_name'] = player_name
+            return redirect(url_for('game', game_id=game_id))
     
     return render_template_string('''
       <!doctype html>
@@ -845,13 +1362,13 @@ def join_game():
 
 @app.route('/game/<game_id>')
 def game(game_id):
-    if game_id not in games or 'player' not in session or session.get('game_id') != game_id:
+    game_data = store.get_game(game_id)
+    if not game_data or 'player' not in session or session.get('game_id') != game_id:
         return redirect(url_for('home'))
     
-    game_data = games[game_id]
     player = session['player']
     player_name = session.get('player_name', f'Player {player}')
-    theme = game_data.get('theme', 'classic')
+    theme = game_data.theme
     
     # Theme-specific variables
     theme_styles = {
@@ -893,6 +1410,7 @@ def game(game_id):
     }
     
     current_theme = theme_styles.get(theme, theme_styles['classic'])
+    board_size = game_data.rules.size
     
     return render_template_string('''
     <!DOCTYPE html>
@@ -1041,9 +1559,9 @@ def game(game_id):
         
         .board {
           display: grid;
-          grid-template-columns: repeat(3, 1fr);
-          gap: 10px;
-          max-width: 400px;
+          grid-template-columns: repeat({{ board_size }}, 1fr);
+          gap: {{ 10 if board_size <= 3 else 3 }}px;
+          max-width: {{ 400 if board_size <= 3 else 600 }}px;
           width: 100%;
           aspect-ratio: 1/1;
         }
@@ -1054,7 +1572,7 @@ def game(game_id):
           display: flex;
           align-items: center;
           justify-content: center;
-          font-size: min(15vw, 80px);
+          font-size: min({{ 45 / board_size }}vw, {{ 240 / board_size }}px);
           font-weight: 800;
           cursor: pointer;
           user-select: none;
@@ -1078,6 +1596,10 @@ def game(game_id):
           animation: rainbowBorder 2s linear infinite, pulseScale 1.5s ease infinite;
         }
         
+        .cell.hint-win { box-shadow: inset 0 0 0 3px #22C55E; }
+        .cell.hint-draw { box-shadow: inset 0 0 0 3px #EAB308; }
+        .cell.hint-loss { box-shadow: inset 0 0 0 3px #EF4444; }
+        
         .cell:not(.x-symbol):not(.o-symbol):hover {
           background: rgba(255, 255, 255, 0.2);
           
@@ -1402,7 +1924,7 @@ def game(game_id):
           }
           
           .cell {
-            font-size: 20vw;
+            font-size: {{ 60 / board_size }}vw;
           }
           
           .controls {
@@ -1453,11 +1975,9 @@ def game(game_id):
                   <i class="far fa-circle"></i> {{ game_data['player_names']['O'] }}
                 </div>
               {% endif %}
-              {% for spec in game_data.get('spectators', []) %}
-                <div class="player-item spectator {% if player == 'spectator' and player_name == spec %}you{% endif %}">
-                  <i class="fas fa-eye"></i> {{ spec }}
-                </div>
-              {% endfor %}
+              <div id="viewers" class="player-item spectator" {% if not viewer_count %}style="display:none"{% endif %}>
+                <i class="fas fa-eye"></i> <span id="viewerCount">{{ viewer_count }}</span> watching
+              </div>
             {% endif %}
           </div>
           
@@ -1479,8 +1999,8 @@ def game(game_id):
           
           <div class="board-container">
             <div id="board" class="board">
-              {% for r in range(3) %}
-                {% for c in range(3) %}
+              {% for r in range(board_size) %}
+                {% for c in range(board_size) %}
                   <div class="cell" data-row="{{ r }}" data-col="{{ c }}"></div>
                 {% endfor %}
               {% endfor %}
@@ -1491,6 +2011,11 @@ def game(game_id):
             <button id="btnRematch" class="btn btn-primary">
               <i class="fas fa-redo"></i> Rematch
             </button>
+            {% if board_size == 3 and player != 'spectator' %}
+            <button id="btnHint" class="btn btn-secondary">
+              <i class="fas fa-lightbulb"></i> Hint
+            </button>
+            {% endif %}
             <button id="btnNewGame" class="btn btn-secondary">
               <i class="fas fa-plus"></i> New Game
             </button>
@@ -1534,8 +2059,40 @@ def game(game_id):
       </div>
       
       <script src="https://cdn.socket.io/4.5.4/socket.io.min.js"></script>
+      <script src="https://cdn.jsdelivr.net/npm/@msgpack/msgpack@2.8.0/dist.es5+umd/msgpack.min.js"></script>
       <script>
-        const socket = io();
+        // Ask for MessagePack when the decoder loaded; the server confirms with wire_format
+        // With several workers the server names the one that owns this game
+        const socketUrl = {{ socket_url|tojson }};
+        const socketOptions = Object.assign({query: {fmt: window.MessagePack ? 'msgpack' : 'json'}},
+                                            {{ io_options|tojson }});
+        const socket = socketUrl ? io(socketUrl, socketOptions) : io(socketOptions);
+        let binary = false;
+        socket.on('wire_format', (fmt) => { binary = fmt === 'msgpack'; });
+        
+        // Binary payloads carry the board as one byte per cell: 0 empty, 1 X, 2 O
+        function decode(data) {
+          if (!(data instanceof ArrayBuffer)) return data;
+          data = MessagePack.decode(new Uint8Array(data));
+          if (data && data.board instanceof Uint8Array) {
+            const marks = [' ', 'X', 'O'];
+            const rows = [];
+            for (let r = 0; r < data.size; r++) {
+              rows.push(Array.from(data.board.subarray(r * data.size, (r + 1) * data.size), v => marks[v]));
+            }
+            data.board = rows;
+          }
+          return data;
+        }
+        
+        function on(event, handler) {
+          socket.on(event, (data) => handler(decode(data)));
+        }
+        
+        function send(event, payload) {
+          socket.emit(event, binary ? MessagePack.encode(payload) : payload);
+        }
+        
         const gameId = "{{ game_id }}";
         const player = "{{ player }}";
         const playerName = "{{ player_name }}";
@@ -1556,17 +2113,66 @@ def game(game_id):
         const btnNewGame = document.getElementById('btnNewGame');
         const btnLeave = document.getElementById('btnLeave');
         
-        // Join game and request initial state
-        socket.emit('join_game', {
-          game_id: gameId, 
-          player: player,
-          player_name: playerName
+        // Last full state plus every delta applied on top of it, and the
+        // time of the newest chat message shown
+        let state = null;
+        let chatSeen = null;
+        
+        // Join on every connect; after a drop the new socket resumes from
+        // what we last saw and gets only what we missed
+        socket.on('connect', () => {
+          send('join_game', {
+            game_id: gameId,
+            player: player,
+            player_name: playerName,
+            seq: state ? state.seq : null,
+            chat_seen: chatSeen
+          });
+        });
+        
+        function requestState() {
+          send('request_state', {game_id: gameId, seq: state ? state.seq : null});
+        }
+        
+        // Full snapshots: on join, or after we reported a stale seq
+        on('game_update', (data) => {
+          state = data;
+          renderState(state);
         });
         
-        socket.emit('request_state', {game_id: gameId});
+        // Per-move deltas; a gap in seq means we missed one, so resync
+        function applyDelta(delta) {
+          if (!state || delta.seq !== state.seq + 1) {
+            requestState();
+            return false;
+          }
+          state.seq = delta.seq;
+          if (delta.reset) {
+            state.board = state.board.map(row => row.map(() => ' '));
+            state.winning_cells = [];
+            state.move_history = [];
+          } else if (delta.cell) {
+            const [r, c] = delta.cell;
+            state.board[r][c] = delta.player;
+            state.move_history.push({player: delta.player, row: r, col: c});
+          }
+          state.current_player = delta.current_player;
+          state.winner = delta.winner;
+          if (delta.winning_cells) state.winning_cells = delta.winning_cells;
+          if (delta.scores) state.scores = delta.scores;
+          if (delta.remaining && state.time_controls) state.time_controls.remaining = delta.remaining;
+          renderState(state);
+          return true;
+        }
+        
+        on('game_delta', applyDelta);
+        
+        // The deltas missed while disconnected, oldest first
+        on('game_replay', (deltas) => {
+          deltas.every(applyDelta);
+        });
         
-        // Game state updates
-        socket.on('game_update', (data) => {
+        function renderState(data) {
           renderBoard(data.board, data.winning_cells);
           updateScores(data.scores);
           
@@ -1606,7 +2212,7 @@ def game(game_id):
             
             // Auto-reset after 5 seconds
             setTimeout(() => {
-              socket.emit('request_reset', {game_id: gameId});
+              send('request_reset', {game_id: gameId});
             }, 5000);
           } else {
             const currentPlayerName = data.player_names[data.current_player] || `Player ${data.current_player}`;
@@ -1614,7 +2220,7 @@ def game(game_id):
               (data.current_player === player ? " — Your move" : "");
             statusEl.className = 'status';
           }
-        });
+        }
         
         // Create confetti effect
         function createConfetti() {
@@ -1666,7 +2272,7 @@ def game(game_id):
         function updateTimer(times, currentPlayer) {
           if (!timerEl) return;
           
-          timerEl.textContent = `X: ${times.X}s | O: ${times.O}s`;
+          timerEl.textContent = `X: ${Math.ceil(times.X)}s | O: ${Math.ceil(times.O)}s`;
           
           // Highlight current player's time
           if (times[currentPlayer] <= 5) {
@@ -1681,7 +2287,7 @@ def game(game_id):
         }
         
         // Player left the game
-        socket.on('player_left', (data) => {
+        on('player_left', (data) => {
           const playerName = data.player_name || `Player ${data.player}`;
           statusEl.textContent = `${playerName} has left the game`;
           statusEl.className = 'status shake';
@@ -1693,13 +2299,11 @@ def game(game_id):
           chatMessagesEl.appendChild(msgEl);
           chatMessagesEl.scrollTop = chatMessagesEl.scrollHeight;
           
-          setTimeout(() => {
-            socket.emit('request_state', {game_id: gameId});
-          }, 2000);
+          setTimeout(requestState, 2000);
         });
         
         // Player joined the game
-        socket.on('player_joined', (data) => {
+        on('player_joined', (data) => {
           const playerName = data.player_name || `Player ${data.player}`;
           const msgEl = document.createElement('div');
           msgEl.className = 'chat-message system';
@@ -1708,17 +2312,14 @@ def game(game_id):
           chatMessagesEl.scrollTop = chatMessagesEl.scrollHeight;
         });
         
-        // Spectator joined
-        socket.on('spectator_joined', (data) => {
-          const msgEl = document.createElement('div');
-          msgEl.className = 'chat-message system';
-          msgEl.textContent = `System: ${data.player_name} is now spectating`;
-          chatMessagesEl.appendChild(msgEl);
-          chatMessagesEl.scrollTop = chatMessagesEl.scrollHeight;
+        // How many are spectating, sent at most once per interval
+        on('viewer_count', (data) => {
+          document.getElementById('viewerCount').textContent = data.viewers;
+          document.getElementById('viewers').style.display = data.viewers ? '' : 'none';
         });
         
         // Invalid move attempt
-        socket.on('invalid_move', (data) => {
+        on('invalid_move', (data) => {
           const prev = statusEl.textContent;
           const prevClass = statusEl.className;
           statusEl.textContent = "Invalid: " + (data.message || "not allowed");
@@ -1730,11 +2331,29 @@ def game(game_id):
         });
         
         // Chat message received
-        socket.on('chat_message', (data) => {
+        function addChatMessage(data) {
           const msgEl = document.createElement('div');
           msgEl.className = 'chat-message';
           msgEl.innerHTML = `<strong>${data.player_name || data.player}:</strong> ${data.message}`;
           chatMessagesEl.appendChild(msgEl);
+          if (data.timestamp) chatSeen = Math.max(chatSeen || 0, data.timestamp);
+        }
+        
+        on('chat_message', (data) => {
+          addChatMessage(data);
+          chatMessagesEl.scrollTop = chatMessagesEl.scrollHeight;
+        });
+        
+        // The backlog, sent once per join, replaces what the page rendered
+        on('chat_history', (messages) => {
+          chatMessagesEl.innerHTML = '';
+          messages.forEach(addChatMessage);
+          chatMessagesEl.scrollTop = chatMessagesEl.scrollHeight;
+        });
+        
+        // Messages sent while we were reconnecting
+        on('chat_missed', (messages) => {
+          messages.forEach(addChatMessage);
           chatMessagesEl.scrollTop = chatMessagesEl.scrollHeight;
         });
         
@@ -1745,8 +2364,8 @@ def game(game_id):
             cell.classList.remove('winner-cell', 'x-symbol', 'o-symbol', 'disabled');
           });
           
-          for (let r = 0; r < 3; r++) {
-            for (let c = 0; c < 3; c++) {
+          for (let r = 0; r < board.length; r++) {
+            for (let c = 0; c < board[r].length; c++) {
               const selector = `.cell[data-row="${r}"][data-col="${c}"]`;
               const cell = document.querySelector(selector);
               cell.textContent = board[r][c] === ' ' ? '' : board[r][c];
@@ -1786,7 +2405,7 @@ def game(game_id):
           const row = parseInt(cell.dataset.row);
           const col = parseInt(cell.dataset.col);
           
-          socket.emit('make_move', {
+          send('make_move', {
             game_id: gameId, 
             player: player, 
             row: row, 
@@ -1806,7 +2425,7 @@ def game(game_id):
         });
         
         function sendMessage() {
-          socket.emit('send_chat', {
+          send('send_chat', {
             game_id: gameId,
             player: player,
             player_name: playerName,
@@ -1817,15 +2436,33 @@ def game(game_id):
         
         // Button handlers
         btnRematch.addEventListener('click', () => {
-          socket.emit('request_reset', {game_id: gameId});
+          send('request_reset', {game_id: gameId});
         });
         
         btnNewGame.addEventListener('click', () => {
           window.location.href = '/';
         });
         
+        // Hints: outline each empty cell by its result under best play
+        const btnHint = document.getElementById('btnHint');
+        if (btnHint) {
+          btnHint.addEventListener('click', () => {
+            send('request_hint', {game_id: gameId});
+          });
+        }
+        
+        on('hint', (data) => {
+          data.cells.forEach(({row, col, result, distance}) => {
+            const cell = document.querySelector(`.cell[data-row="${row}"][data-col="${col}"]`);
+            if (!cell) return;
+            cell.classList.add('hint-' + result);
+            cell.title = `${result} in ${distance}`;
+            setTimeout(() => cell.classList.remove('hint-' + result), 3000);
+          });
+        });
+        
         btnLeave.addEventListener('click', () => {
-          socket.emit('leave_game', {
+          send('leave_game', {
             game_id: gameId, 
             player: player,
             player_name: playerName
@@ -1835,7 +2472,7 @@ def game(game_id):
         
         // Cleanup on page leave
         window.addEventListener('beforeunload', () => {
-          socket.emit('leave_game', {
+          send('leave_game', {
             game_id: gameId, 
             player: player,
             player_name: playerName
@@ -1849,202 +2486,321 @@ def game(game_id):
       </script>
     </body>
     </html>
-    ''', game_id=game_id, player=player, player_name=player_name, 
-        game_data=game_data, current_theme=current_theme,
-        chat_messages=chat_messages.get(game_id, []))
+    ''', game_id=game_id, player=player, player_name=player_name, socket_url=_socket_url(game_id),
+        game_data=_pack_game(game_data), viewer_count=viewers.count(game_id),
+        current_theme=current_theme, board_size=board_size,
+        chat_messages=store.chat_history(game_id))
 
 # ----- Socket.IO event handlers -----
+def throttled(event):
+    # Goes below @socketio.on(event), so the registered handler is this gate:
+    # an event over its sender's limit, or its game's, is dropped before the
+    # handler runs (it still costs Flask-SocketIO's request context, built
+    # before the gate is called). The game is the one connected has the sid
+    # seated in, never a game_id from the event, so outsiders cannot drain a
+    # real game's bucket or make buckets for games that do not exist;
+    # spectators and unjoined sockets are only limited per sid. The sid is
+    # read from _get_current_object(): request.sid through the proxy alone
+    # costs more than the bucket check
+    clock = time.monotonic
+    current_request = request._get_current_object
+    seat_roles = gamestate.SEAT
+
+    def wrap(handler):
+        @functools.wraps(handler)
+        def gate(*args):
+            limit = rate_limiter.limits.get(event)
+            if limit is None:
+                return handler(*args)
+            sid = current_request().sid
+            room = None
+            if limit.room_interval is not None:
+                entry = connected.sockets.get(sid)
+                if entry is not None and entry[1] in seat_roles:
+                    room = entry[0]
+            if limit.allow(sid, room, clock()):
+                return handler(*args)
+        return gate
+    return wrap
+
 @socketio.on('connect')
 def handle_connect():
-    active_players.add(request.sid)
-    emit('player_count', len(active_players), broadcast=True)
+    store.add_client(request.sid)
+    # Clients ask for MessagePack with ?fmt=msgpack and are told what they got
+    fmt = wire.negotiate(request.args.get('fmt'))
+    if fmt == wire.BINARY:
+        binary_clients.add(request.sid)
+    emit('wire_format', fmt)
+    _presence_changed()
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    if request.sid in active_players:
-        active_players.remove(request.sid)
-    emit('player_count', len(active_players), broadcast=True)
+    store.remove_client(request.sid)
+    binary_clients.discard(request.sid)
+    rate_limiter.forget_sid(request.sid)
+    viewers.remove(request.sid)
+    _release_socket(request.sid)
+    _presence_changed()
+
+def _release_socket(sid):
+    held = connected.release(sid)
+    if held is not None:
+        game_id, role, _ = held
+        if role in gamestate.SEAT and not connected.holders(game_id, role):
+            # The page may resume on a new socket; free the seat only if it doesn't
+            departures.schedule((game_id, role), time.time() + SEAT_GRACE)
+            _start_expiry_sweeper()
+
+@socketio.on('subscribe_presence')
+def handle_subscribe_presence(data=None):
+    join_room(_game_room(PRESENCE_ROOM, request.sid))
+    _send('player_count', store.client_count())
+
+@socketio.on('unsubscribe_presence')
+def handle_unsubscribe_presence(data=None):
+    leave_room(_game_room(PRESENCE_ROOM, request.sid))
+
+def _presence_changed():
+    presence['changes'] += 1
+    presence['dirty'] = True
+    _start_presence_task()
+
+def _start_presence_task():
+    global presence_task
+    if presence_task is not None:
+        return
+
+    def flush():
+        while True:
+            socketio.sleep(PRESENCE_INTERVAL)
+            # Other workers' connects never mark this one dirty, so clustered workers always look
+            if not presence['dirty'] and worker is None:
+                continue
+            presence['dirty'] = False
+            count = store.client_count()
+            if count == presence['sent']:
+                continue
+            presence['sent'] = count
+            # Every worker sends the shared count to its own subscribers, so skip the bus
+            rooms = socketio.server.manager.rooms.get('/', {})
+            if rooms.get(PRESENCE_ROOM):
+                socketio.emit('player_count', count, room=PRESENCE_ROOM, ignore_queue=True)
+                presence['broadcasts'] += 1
+            twin = wire.binary_room(PRESENCE_ROOM)
+            if rooms.get(twin):
+                socketio.emit('player_count', wire.pack(count), room=twin, ignore_queue=True)
+                presence['broadcasts'] += 1
+
+    presence_task = socketio.start_background_task(flush)
+
+def _start_spectator_task():
+    global spectator_task
+    if spectator_task is not None:
+        return
+
+    def flush():
+        while True:
+            socketio.sleep(SPECTATOR_INTERVAL)
+            stale, recounted = viewers.take()
+            if not stale and not recounted:
+                continue
+            # Games stick to one worker, and so do their spectators, so skip the bus
+            rooms = socketio.server.manager.rooms.get('/', {})
+            for game_id in stale:
+                room = spectators.watch_room(game_id)
+                twin = wire.binary_room(room)
+                if not rooms.get(room) and not rooms.get(twin):
+                    continue
+                game = store.get_game(game_id)
+                if game is None:
+                    continue
+                if rooms.get(room):
+                    socketio.emit('game_update', _snapshot(game), room=room, ignore_queue=True)
+                if rooms.get(twin):
+                    socketio.emit('game_update', _snapshot(game, wire.BINARY), room=twin, ignore_queue=True)
+            for game_id in recounted:
+                count = {'viewers': viewers.count(game_id)}
+                for room in (game_id, spectators.watch_room(game_id)):
+                    if rooms.get(room):
+                        socketio.emit('viewer_count', count, room=room, ignore_queue=True)
+                    twin = wire.binary_room(room)
+                    if rooms.get(twin):
+                        socketio.emit('viewer_count', wire.pack(count), room=twin, ignore_queue=True)
+
+    spectator_task = socketio.start_background_task(flush)
 
 @socketio.on('join_game')
+@throttled('join_game')
 def handle_join(data):
+    data = wire.incoming(data)
     game_id = data.get('game_id')
-    player = data.get('player')
-    player_name = data.get('player_name', f'Player {player}')
+    # The role this browser was given for the game, if it was given one
+    source = session if game_id and session.get('game_id') == game_id else data
+    player = source.get('player')
+    player_name = source.get('player_name', f'Player {player}')
+    # A client back on a new socket after a drop says what it last saw
+    seq = data.get('seq')
+    resuming = type(seq) is int
     
-    if not game_id or game_id not in games:
-        emit('invalid_move', {'message': 'Game not found'})
-        return
-    
-    join_room(game_id)
+    with game_locks(game_id):
+        game = store.get_game(game_id) if game_id else None
+        if not game:
+            _send('invalid_move', {'message': 'Game not found'})
+            return
+        if player != 'spectator' and player not in gamestate.SEAT:
+            _send('invalid_move', {'message': 'Invalid player'})
+            return
+        if game.is_seated(player) and game.name_of(player) != player_name:
+            # The seat was freed while this player was away and someone else took it
+            _send('invalid_move', {'message': f'Seat {player} has been taken'})
+            return
     
-    if player == 'spectator':
-        games[game_id]['spectators'].append(player_name)
-        emit('spectator_joined', {
-            'player_name': player_name
-        }, room=game_id)
-    else:
-        # Update player name if provided
-        if 'player_names' not in games[game_id]:
-            games[game_id]['player_names'] = {}
-        games[game_id]['player_names'][player] = player_name
-        
-        emit('player_joined', {
-            'player': player,
-            'player_name': player_name
-        }, room=game_id)
+        connected.bind(request.sid, game_id, player, player_name)
+        if player == 'spectator':
+            # Spectators get their own room and only the game's coalesced
+            # snapshots; the players just see the count change
+            join_room(_game_room(spectators.watch_room(game_id), request.sid))
+            viewers.add(request.sid, game_id)
+            _start_spectator_task()
+            if resuming:
+                _catch_up(game, seq)
+            else:
+                _send_snapshot(game)
+        else:
+            departures.cancel((game_id, player))
+            join_room(_game_room(game_id, request.sid))
+            before = game.seq
+            # Back after the seat was freed: take it again
+            if not game.is_seated(player):
+                _take_seat(game, player, player_name)
+        
+            if resuming and game.seq == before:
+                # Nothing changed for the others; only this client catches up
+                _catch_up(game, seq)
+            else:
+                _broadcast('player_joined', {
+                    'player': player,
+                    'player_name': player_name
+                }, game_id)
     
-    emit('game_update', _pack_game(games[game_id]), room=game_id)
+                _save(game)
+                _broadcast_snapshot(game_id, game)
+            _run_clock(game)
+            _send('viewer_count', {'viewers': viewers.count(game_id)})
     
-    # Send chat history
-    for msg in chat_messages.get(game_id, [])[-50:]:
-        emit('chat_message', msg, room=request.sid)
+    # The chat backlog goes out as one event; a resuming client that has
+    # seen part of it gets only the newer messages
+    backlog = store.chat_history(game_id, CHAT_BACKLOG)
+    chat_seen = data.get('chat_seen')
+    if resuming and type(chat_seen) in (int, float):
+        missed = [m for m in backlog if m.get('timestamp', 0) > chat_seen]
+        if len(missed) < CHAT_BACKLOG:
+            if missed:
+                _send('chat_missed', missed)
+            return
+    _send('chat_history', backlog)
 
 @socketio.on('leave_game')
 def handle_leave(data):
-    game_id = data.get('game_id')
-    player = data.get('player')
-    player_name = data.get('player_name', f'Player {player}')
-    
-    if game_id and game_id in games:
-        leave_room(game_id)
-        
-        if player == 'spectator':
-            if player_name in games[game_id]['spectators']:
-                games[game_id]['spectators'].remove(player_name)
-        elif player in games[game_id]['players']:
-            games[game_id]['players'].remove(player)
-            
-            # Notify remaining players
-            emit('player_left', {
-                'player': player,
-                'player_name': player_name
-            }, room=game_id)
-            
-            emit('chat_message', {
-                'player': 'System',
-                'player_name': 'System',
-                'message': f'{player_name} has left the game'
-            }, room=game_id)
-            
-            # If no players left, clean up the game after a delay
-            if not games[game_id]['players']:
-                def cleanup():
-                    if game_id in games:
-                        del games[game_id]
-                    if game_id in chat_messages:
-                        del chat_messages[game_id]
-                socketio.start_background_task(lambda: socketio.sleep(60) or cleanup())
+    # Leaves what this socket joined, whatever the event names: a socket can
+    # only give up its own seat. The seat is freed as for a dropped socket,
+    # once no other tab holds it and SEAT_GRACE has passed without a rejoin
+    held = connected.get(request.sid)
+    if held is not None:
+        game_id, role, _ = held
+        if role == 'spectator':
+            leave_room(_game_room(spectators.watch_room(game_id), request.sid))
+            viewers.remove(request.sid)
+        else:
+            leave_room(_game_room(game_id, request.sid))
+    _release_socket(request.sid)
 
 @socketio.on('request_state')
+@throttled('request_state')
 def handle_request_state(data):
-    game_id = data.get('game_id')
-    if game_id in games:
-        emit('game_update', _pack_game(games[game_id]))
+    data = wire.incoming(data)
+    # Full snapshot only when the client's seq is missing or stale
+    game = store.get_game(data.get('game_id'))
+    if game and data.get('seq') != game.seq:
+        _send_snapshot(game)
 
 @socketio.on('request_reset')
+@throttled('request_reset')
 def handle_request_reset(data):
+    data = wire.incoming(data)
     game_id = data.get('game_id')
-    if game_id in games and games[game_id]['winner']:
-        reset_game(game_id)
-        emit('game_update', _pack_game(games[game_id]), room=game_id)
-        emit('chat_message', {
-            'player': 'System',
-            'player_name': 'System',
-            'message': 'Game has been reset!'
-        }, room=game_id)
+    with game_locks(game_id):
+        game = store.get_game(game_id)
+        if game and game.winner:
+            reset_game(game_id)
+            delta = {
+                'seq': game.seq,
+                'reset': True,
+                'current_player': game.current_player,
+                'winner': None
+            }
+            if game.time_controls:
+                delta['remaining'] = dict(game.time_controls['remaining'])
+            _broadcast_delta(game, delta)
+            _broadcast_chat({
+                'player': 'System',
+                'player_name': 'System',
+                'message': 'Game has been reset!'
+            }, game_id)
 
 @socketio.on('make_move')
+@throttled('make_move')
 def handle_make_move(data):
+    data = wire.incoming(data)
     game_id = data.get('game_id')
     player = data.get('player')
     row = data.get('row')
     col = data.get('col')
     
-    if not game_id or game_id not in games:
-        emit('invalid_move', {'message': 'Game not found'})
-        return
+    with game_locks(game_id):
+        game = store.get_game(game_id) if game_id else None
+        if not game:
+            _send('invalid_move', {'message': 'Game not found'})
+            return
 
-    game = games[game_id]
+        # Validations
+        if len(game.players) < 2:
+            _send('invalid_move', {'message': 'Waiting for another player'})
+            return
+        if game.winner:
+            _send('invalid_move', {'message': 'Game already ended'})
+            return
+        if game.time_controls and _clock_left(game, time.time()) <= 0:
+            # Arrived after the deadline but before the wheel's tick
+            _flag(game)
+            return
+        if game.current_player != player:
+            _send('invalid_move', {'message': 'Not your turn'})
+            return
+        try:
+            r = int(row); c = int(col)
+        except:
+            _send('invalid_move', {'message': 'Invalid coordinates'})
+            return
+        rules = game.rules
+        if not rules.in_bounds(r, c):
+            _send('invalid_move', {'message': 'Out of bounds'})
+            return
+        cell = rules.cell_index(r, c)
+        if engine.is_taken(game.bits, cell):
+            _send('invalid_move', {'message': 'Cell already taken'})
+            return
 
-    # Validations
-    if len(game['players']) < 2:
-        emit('invalid_move', {'message': 'Waiting for another player'})
-        return
-    if game['winner']:
-        emit('invalid_move', {'message': 'Game already ended'})
-        return
-    if game['current_player'] != player:
-        emit('invalid_move', {'message': 'Not your turn'})
-        return
-    try:
-        r = int(row); c = int(col)
-    except:
-        emit('invalid_move', {'message': 'Invalid coordinates'})
-        return
-    if r < 0 or r > 2 or c < 0 or c > 2:
-        emit('invalid_move', {'message': 'Out of bounds'})
-        return
-    if game['board'][r][c] != ' ':
-        emit('invalid_move', {'message': 'Cell already taken'})
-        return
-
-    # Apply move
-    game['board'][r][c] = player
-    game['last_move_time'] = time.time()
-    
-    # Add to move history
-    move_record = {
-        'player': player,
-        'row': r,
-        'col': c,
-        'timestamp': time.time()
-    }
-    game['move_history'].append(move_record)
-    
-    # Check for winner
-    winner, winning_cells = check_winner(game['board'])
-    
-    if winner:
-        game['winner'] = winner
-        game['winning_cells'] = winning_cells
-        if winner != 'Tie':
-            game['scores'][winner] += 1
-            
-            # Update player stats
-            winner_name = game['player_names'].get(winner, f'Player {winner}')
-            loser_name = game['player_names'].get('O' if winner == 'X' else 'X', f'Player {'O' if winner == 'X' else 'X'}')
-            
-            # This would be more robust with a proper database
-            player_stats[winner_name]['wins'] += 1
-            player_stats[winner_name]['games_played'] += 1
-            player_stats[loser_name]['losses'] += 1
-            player_stats[loser_name]['games_played'] += 1
-        else:
-            # Update tie stats
-            x_name = game['player_names'].get('X', 'Player X')
-            o_name = game['player_names'].get('O', 'Player O')
-            player_stats[x_name]['ties'] += 1
-            player_stats[x_name]['games_played'] += 1
-            player_stats[o_name]['ties'] += 1
-            player_stats[o_name]['games_played'] += 1
-    else:
-        game['current_player'] = 'O' if player == 'X' else 'X'
+        _apply_move(game, player, cell)
     
-    # Update time controls if applicable
-    if game.get('time_controls'):
-        move_time = time.time() - game['last_move_time']
-        game['time_controls']['remaining'][player] = max(0, game['time_controls']['remaining'][player] - move_time)
-        
-        # Check for time forfeit
-        if game['time_controls']['remaining'][player] <= 0:
-            game['winner'] = 'O' if player == 'X' else 'X'
-            game['scores'][game['winner']] += 1
-    
-    # Broadcast updated game to everyone in the room
-    emit('game_update', _pack_game(game), room=game_id)
+        # Broadcast just the move to everyone in the room
+        _broadcast_delta(game, _pack_delta(game, player, cell))
+        _computer_reply(game_id)
 
 @socketio.on('send_chat')
+@throttled('send_chat')
 def handle_send_chat(data):
+    data = wire.incoming(data)
     game_id = data.get('game_id')
     player = data.get('player')
     player_name = data.get('player_name', f'Player {player}')
@@ -2053,19 +2809,73 @@ def handle_send_chat(data):
     if not message:
         return
     
-    if game_id and game_id in games:
-        # Store message (limit to 100 messages per game)
+    if game_id and store.get_game(game_id):
+        # Store message (the store keeps the last CHAT_LIMIT per game)
         chat_record = {
             'player': player,
             'player_name': player_name,
             'message': message,
             'timestamp': time.time()
         }
-        chat_messages[game_id].append(chat_record)
-        chat_messages[game_id] = chat_messages[game_id][-100:]
+        with game_locks(game_id):
+            store.add_chat(game_id, chat_record)
         
-        # Broadcast to all in the room
-        emit('chat_message', chat_record, room=game_id)
+            # Broadcast to all in the room and its spectators
+            _broadcast_chat(chat_record, game_id)
+
+
+@socketio.on('wait_for_match')
+def handle_wait_for_match():
+    # The waiting page's channel; the token comes from the session, not the client
+    token = session.get('random_token')
+    if not token:
+        return
+    join_room(_match_room(token))
+    # The pairing may have happened before this socket connected
+    ticket = matchmaker.tickets.get(token)
+    if ticket is not None and ticket.matched:
+        emit('matched', {'game_id': ticket.game_id})
+
+@socketio.on('request_hint')
+@throttled('request_hint')
+def handle_request_hint(data):
+    data = wire.incoming(data)
+    game_id = data.get('game_id')
+    game = store.get_game(game_id)
+    if game:
+        _send('hint', _analyze(game_id, game))
+
+
+@app.route('/analysis/<game_id>')
+def game_analysis(game_id):
+    game = store.get_game(game_id)
+    if not game:
+        return {'message': 'Game not found'}, 404
+    return _analyze(game_id, game)
+
+@app.route('/metrics')
+def metrics():
+    return {
+        'games': store.game_count(),
+        'active_players': store.client_count(),
+        'store': store.backend,
+        'analysis_cache': analyzer.cache.stats(),
+        'matchmaking': matchmaker.stats(),
+        'presence': presence,
+        'matches': match_log.stats(),
+        'replay': replays.stats(),
+        'spectators': viewers.stats(),
+        'game_locks': game_locks.stats(),
+        'rate_limits': rate_limiter.stats(),
+        'clocks': clock_wheel.stats(),
+        'expiry': dict(eviction_stats, pending=len(expiry), store_bytes=store.footprint()),
+        'connections': dict(connected.stats(), departures=len(departures)),
+        'snapshots': dict(snapshot_stats, avoidance_ratio=_ratio(
+            snapshot_stats['reused'], snapshot_stats['encoded'] + snapshot_stats['reused']))
+    }
+
+def _ratio(part, total):
+    return part / total if total else 0.0
 
 
 # ========== AUTHENTICATION ROUTES ==========
@@ -2145,5 +2955,29 @@ def delete_user(username):
     save_users(users)
     return redirect(url_for('admin_dashboard'))
 
+def _start_worker(node, bus_path):
+    # Runs in each forked worker before it starts serving
+    global worker, store
+    worker = node
+    store = storage.open_store(os.environ.get('OX_STORE', 'memory'), app.instance_path, CHAT_LIMIT,
+                               gamelocks.lock_factory(socketio.server.async_mode))
+    manager = cluster.BusManager(bus_path)
+    manager.set_server(socketio.server)
+    socketio.server.manager = manager
+    app.jinja_env.globals['io_options'] = {'transports': ['websocket']}
+
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+    if args.workers > 1:
+        if store.backend == 'memory':
+            parser.error('--workers needs a shared store: set OX_STORE to sqlite or redis://')
+        if ASYNC_MODE != 'eventlet':
+            parser.error('--workers forks eventlet servers: unset OX_ASYNC_MODE')
+        cluster.serve(app, args.host, args.port, args.workers, _start_worker)
+    else:
+        # Werkzeug's server, used for 'threading', refuses to start without a terminal unless told
+        socketio.run(app, host=args.host, port=args.port, debug=True, allow_unsafe_werkzeug=True)
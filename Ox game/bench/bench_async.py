@@ -0,0 +1,141 @@
+# Move throughput and broadcast latency on each async backend.
+#
+#   python bench/bench_async.py [clients] [games_per_client] [seconds] [modes ...]
+#
+# For every OX_ASYNC_MODE given (default: each of app.ASYNC_MODES whose
+# package is installed) this starts the server on the memory store, creates
+# games over HTTP as the home page does, and runs client processes that each
+# play their games over raw Socket.IO websockets, one socket per seat. Every
+# move is sent from the mover's socket and timed until its game_delta reaches
+# the opponent's socket; the next move on that game waits for it. Reports
+# moves/sec over all games and the p50/p99 of that broadcast latency.
+
+import http.client
+import importlib.util
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import isolate_db
+from load_workers import HOST, SocketIOClient, free_port, wait_until_serving
+
+# app.ASYNC_MODES, without importing the app (and its async backend) here
+ASYNC_MODES = ('eventlet', 'gevent', 'threading')
+
+
+def installed(mode):
+    return mode == 'threading' or importlib.util.find_spec(mode) is not None
+
+
+def post(port, path, form):
+    conn = http.client.HTTPConnection(HOST, port, timeout=10)
+    conn.request('POST', path, urllib.parse.urlencode(form),
+                 {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.getheader('Location', '')
+
+
+def create_game(port):
+    game_id = post(port, '/create', {'player_name': 'x', 'game_mode': 'standard'}).rsplit('/', 1)[-1]
+    post(port, '/join', {'game_id': game_id, 'player_name': 'o'})
+    return game_id
+
+
+def play(port, game_ids, seconds, results):
+    rng = random.Random(game_ids[0])
+    games = {}
+    for game_id in game_ids:
+        seats = {}
+        for player in ('X', 'O'):
+            seats[player] = SocketIOClient(port)
+            seats[player].emit('join_game', {'game_id': game_id, 'player': player, 'player_name': player.lower()})
+        seq = max(seats[p].wait('game_update')['seq'] for p in seats)
+        games[game_id] = [seats, seq, list(range(9)), 'X']
+    moves = 0
+    latencies = []
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        for game_id, entry in games.items():
+            seats, seq, free, player = entry
+            other = 'O' if player == 'X' else 'X'
+            cell = free.pop(rng.randrange(len(free)))
+            start = time.perf_counter()
+            seats[player].emit('make_move', {'game_id': game_id, 'player': player,
+                                             'row': cell // 3, 'col': cell % 3})
+            delta = seats[other].wait('game_delta', lambda d, s=seq: d['seq'] > s)
+            latencies.append(time.perf_counter() - start)
+            seats[player].wait('game_delta', lambda d, s=delta['seq']: d['seq'] >= s)
+            moves += 1
+            if delta['winner']:
+                seats[player].emit('request_reset', {'game_id': game_id})
+                for p in seats:
+                    delta = seats[p].wait('game_delta', lambda d: d.get('reset'))
+                entry[2] = list(range(9))
+            entry[1] = delta['seq']
+            entry[3] = delta['current_player']
+    for seats, *_ in games.values():
+        for client in seats.values():
+            client.close()
+    results.put((moves, latencies))
+
+
+def run(mode, clients, per_client, seconds):
+    port = free_port(0)
+    env = dict(os.environ, OX_ASYNC_MODE=mode, OX_STORE='memory', OX_RATE_LIMITS='{}',
+               OX_MATCH_DB=isolate_db.path(f'match-{mode}.db'), PYTHONWARNINGS='ignore')
+    server = subprocess.Popen(
+        [sys.executable, '-c', 'import app; '
+         f'app.socketio.run(app.app, host={HOST!r}, port={port}, log_output=False, allow_unsafe_werkzeug=True)'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_serving(port)
+        game_ids = [create_game(port) for _ in range(clients * per_client)]
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=play, args=(
+            port, game_ids[i * per_client:(i + 1) * per_client], seconds, results))
+            for i in range(clients)]
+        for p in procs:
+            p.start()
+        moves = 0
+        latencies = []
+        for _ in procs:
+            done, timings = results.get(timeout=seconds + 60)
+            moves += done
+            latencies.extend(timings)
+        for p in procs:
+            p.join()
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return moves / seconds, statistics.median(latencies), p99
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    modes = sys.argv[4:] or ASYNC_MODES
+    print(f'{os.cpu_count()} cpus, {clients} client processes x {per_client} games, {seconds:.0f}s per run')
+    print(f'{"mode":>10} {"moves/sec":>10} {"p50 ms":>8} {"p99 ms":>8}')
+    for mode in modes:
+        if not installed(mode):
+            print(f'{mode:>10} {"not installed":>28}')
+            continue
+        rate, p50, p99 = run(mode, clients, per_client, seconds)
+        print(f'{mode:>10} {rate:>10.0f} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
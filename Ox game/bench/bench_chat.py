@@ -0,0 +1,96 @@
+# Chat logs as a trimmed list, a bounded deque and MemoryStore's ChatRing,
+# and the join backlog as one event versus one event per message.
+#
+#   python bench/bench_chat.py [games] [messages_per_game] [capacity]
+#
+# Appends `messages_per_game` messages to each of `games` logs kept to
+# `capacity` and reports the time per append and the memory the logs hold
+# (tracemalloc), for games with a full log and for games with only a few
+# messages. Then encodes the 50-message backlog a joining client receives
+# both ways and compares emit count and wire bytes.
+
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+import wire
+
+BACKLOG = 50
+
+
+class ListLog:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.chat = {}
+
+    def add_chat(self, game_id, record):
+        messages = self.chat.setdefault(game_id, [])
+        messages.append(record)
+        if len(messages) > self.capacity:
+            del messages[:-self.capacity]
+
+
+class DequeLog:
+    def __init__(self, capacity):
+        self.chat = {}
+        self.make = partial(deque, maxlen=capacity)
+
+    def add_chat(self, game_id, record):
+        messages = self.chat.get(game_id)
+        if messages is None:
+            messages = self.chat[game_id] = self.make()
+        messages.append(record)
+
+
+def message(game, n):
+    return {'player': 'X', 'player_name': f'player{game}', 'message': f'message {n}', 'timestamp': 0.0}
+
+
+def fill(log, games, per_game):
+    # Records are built first so only the logs' own storage is measured
+    records = [message(g, n) for n in range(per_game) for g in range(games)]
+    ids = [f'G{g:05d}' for g in range(games)] * per_game
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for game_id, record in zip(ids, records):
+        log.add_chat(game_id, record)
+    elapsed = time.perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return elapsed / len(records), held
+
+
+def packet(event, payload):
+    return '42' + wire.dumps([event, payload])
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_game = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    capacity = int(sys.argv[3]) if len(sys.argv) > 3 else storage.CHAT_LIMIT
+    print(f'{games} games, capacity {capacity}')
+    print(f'{"log":>6} {"messages":>9} {"us/append":>10} {"KiB held":>10}')
+    for count in (per_game, 3):
+        for name, make in (('list', ListLog), ('deque', DequeLog), ('ring', storage.MemoryStore)):
+            per_append, held = fill(make(capacity), games, count)
+            print(f'{name:>6} {count:>9} {per_append * 1e6:>10.2f} {held / 1024:>10.0f}')
+
+    store = storage.MemoryStore(capacity)
+    for n in range(per_game):
+        store.add_chat('G00000', message(0, n))
+    backlog = store.chat_history('G00000', BACKLOG)
+    separate = [packet('chat_message', m) for m in backlog]
+    single = packet('chat_history', backlog)
+    print(f'join backlog of {len(backlog)}: {len(separate)} emits / {sum(map(len, separate))} bytes '
+          f'-> 1 emit / {len(single)} bytes')
+
+
+if __name__ == '__main__':
+    main()
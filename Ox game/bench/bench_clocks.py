@@ -0,0 +1,76 @@
+# Cost of running every timed game's clock from one timer wheel.
+#
+#   python bench/bench_clocks.py [max_clocks]
+#
+# For 1k, 10k ... max_clocks live clocks with blitz/timed-like deadlines,
+# replays a minute of play on a simulated clock: every tick some clocks are
+# rescheduled (a move was made) and the wheel is advanced one tick. Reports
+# the cost per tick and per reschedule, next to a scan of all deadlines per
+# tick (what polling every game would cost), and how late the latest timer
+# fired after its deadline (never early; at most one tick late).
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import timerwheel
+
+TICK = 0.01
+SECONDS = 60
+
+
+def run(clocks, rng):
+    wheel = timerwheel.TimerWheel(0.0, TICK)
+    deadlines = {}
+    for key in range(clocks):
+        deadlines[key] = rng.uniform(0.5, 60)
+        wheel.schedule(key, deadlines[key])
+    # About one move per clock every five seconds
+    moves_per_tick = max(1, int(clocks * TICK / 5))
+    ticks = int(SECONDS / TICK)
+    early = 0
+    late = 0.0
+    move_time = tick_time = 0.0
+    for n in range(1, ticks + 1):
+        now = n * TICK
+        start = time.perf_counter()
+        for _ in range(moves_per_tick):
+            key = rng.randrange(clocks)
+            if key in wheel:
+                deadlines[key] = now + rng.uniform(0.5, 60)
+                wheel.schedule(key, deadlines[key])
+        middle = time.perf_counter()
+        for key in wheel.advance(now):
+            if deadlines[key] > now:
+                early += 1
+            late = max(late, now - deadlines[key])
+        end = time.perf_counter()
+        move_time += middle - start
+        tick_time += end - middle
+
+    start = time.perf_counter()
+    for _ in range(100):
+        [k for k, d in deadlines.items() if d <= SECONDS]
+    scan = (time.perf_counter() - start) / 100
+    return tick_time / ticks, move_time / (ticks * moves_per_tick), scan, wheel.fired, early, late
+
+
+def main():
+    max_clocks = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(16)
+    print(f'{SECONDS}s simulated at {TICK * 1000:.0f} ms ticks')
+    print(f'{"clocks":>8} {"us/tick":>8} {"us/move":>8} {"scan us/tick":>13} {"fired":>7} '
+          f'{"early":>6} {"max late ms":>12}')
+    clocks = 1000
+    while clocks <= max_clocks:
+        per_tick, per_move, scan, fired, early, late = run(clocks, rng)
+        print(f'{clocks:>8} {per_tick * 1e6:>8.2f} {per_move * 1e6:>8.2f} {scan * 1e6:>13.0f} '
+              f'{fired:>7} {early:>6} {late * 1000:>12.1f}')
+        clocks *= 10
+
+
+if __name__ == '__main__':
+    main()
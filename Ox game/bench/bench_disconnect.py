@@ -0,0 +1,78 @@
+# Cost of a socket disconnect as the number of live games grows.
+#
+#   python bench/bench_disconnect.py [games ...]
+#
+# Fills the store with `games` two-player games whose sockets are bound in
+# the connection registry, then disconnects the sockets of 200 of them and
+# reports the time per disconnect handler, next to a scan of every game for
+# the seat a sid might hold (the lookup there would be without the
+# registry). The seats' departures are scheduled, not run.
+
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+# Before app, so the run writes nothing under instance/
+import isolate_db
+
+import app
+import gamestate
+
+SAMPLE = 200
+
+
+def fill(games):
+    app.store = app.storage.MemoryStore()
+    app.connected = app.connections.Connections()
+    app.departures = app.timerwheel.TimerWheel(time.time(), tick=1.0)
+    # Departures are only scheduled here
+    app.expiry_sweeper = True
+    sids = []
+    for n in range(games):
+        game = gamestate.Game(f'G{n:06d}')
+        game.seat('X', f'x{n}')
+        game.seat('O', f'o{n}')
+        app.store.save_game(game)
+        for player in gamestate.PLAYERS:
+            sid = f'{player}{n}'
+            app.store.add_client(sid)
+            app.connected.bind(sid, game.game_id, player, game.name_of(player))
+            sids.append(sid)
+    return sids
+
+
+def disconnect(sid):
+    # handle_disconnect's store and registry work, without a request context
+    app.store.remove_client(sid)
+    app._release_socket(sid)
+
+
+def scan(name):
+    for game_id in app.store.game_ids():
+        game = app.store.get_game(game_id)
+        if name in game.names:
+            return game_id
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 1000, 10000, 50000]
+    print(f'{"games":>7} {"disconnect us":>14} {"scan us":>10}')
+    for games in sizes:
+        sids = fill(games)
+        sample = sids[::max(1, len(sids) // SAMPLE)][:SAMPLE]
+        start = time.perf_counter()
+        for sid in sample:
+            disconnect(sid)
+        per_disconnect = (time.perf_counter() - start) / len(sample)
+        start = time.perf_counter()
+        for n in range(0, games, max(1, games // 20)):
+            scan(f'o{n}')
+        per_scan = (time.perf_counter() - start) / len(range(0, games, max(1, games // 20)))
+        print(f'{games:>7} {per_disconnect * 1e6:>14.2f} {per_scan * 1e6:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
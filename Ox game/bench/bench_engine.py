@@ -0,0 +1,91 @@
+# Per-move CPU cost: list-of-lists board + full check_winner rescan vs the bitboard engine.
+#
+#   python bench/bench_engine.py [games]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine
+
+
+def legacy_check_winner(board):
+    # The pre-engine check_winner, kept verbatim for comparison
+    for row in range(3):
+        if board[row][0] == board[row][1] == board[row][2] and board[row][0] != ' ':
+            return board[row][0], [(row, 0), (row, 1), (row, 2)]
+    for col in range(3):
+        if board[0][col] == board[1][col] == board[2][col] and board[0][col] != ' ':
+            return board[0][col], [(0, col), (1, col), (2, col)]
+    if board[0][0] == board[1][1] == board[2][2] and board[0][0] != ' ':
+        return board[0][0], [(0, 0), (1, 1), (2, 2)]
+    if board[0][2] == board[1][1] == board[2][0] and board[0][2] != ' ':
+        return board[0][2], [(0, 2), (1, 1), (2, 0)]
+    if all(cell != ' ' for row in board for cell in row):
+        return 'Tie', []
+    return None, []
+
+
+def legacy_game(order):
+    board = [[' ', ' ', ' '] for _ in range(3)]
+    player = 'X'
+    for cell in order:
+        r, c = divmod(cell, 3)
+        board[r][c] = player
+        winner, _ = legacy_check_winner(board)
+        if winner:
+            return winner
+        player = 'O' if player == 'X' else 'X'
+
+
+def bitboard_game(order):
+    bits = engine.new_bits()
+    player = 'X'
+    for n, cell in enumerate(order, 1):
+        winner, _ = engine.STANDARD.play(bits, player, cell, n)
+        if winner:
+            return winner
+        player = 'O' if player == 'X' else 'X'
+
+
+def timed(fn, orders):
+    start = time.perf_counter()
+    for order in orders:
+        fn(order)
+    return time.perf_counter() - start
+
+
+def _moves_played(order):
+    bits = engine.new_bits()
+    player = 'X'
+    for n, cell in enumerate(order, 1):
+        winner, _ = engine.STANDARD.play(bits, player, cell, n)
+        if winner:
+            return n
+        player = 'O' if player == 'X' else 'X'
+    return len(order)
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(1)
+    orders = [rng.sample(range(9), 9) for _ in range(games)]
+
+    # Both paths must agree before timing means anything
+    for order in orders[:5000]:
+        assert legacy_game(order) == bitboard_game(order)
+
+    moves = sum(_moves_played(order) for order in orders)
+    results = {}
+    for name, fn in (('list+check_winner', legacy_game), ('bitboard', bitboard_game)):
+        elapsed = timed(fn, orders)
+        results[name] = elapsed / moves * 1e9
+        print(f'{name:>18}: {results[name]:8.1f} ns/move  ({moves} moves, {elapsed:.3f}s)')
+    print(f'{"speedup":>18}: {results["list+check_winner"] / results["bitboard"]:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# Sustained inserts into the match table, written behind versus inline.
+#
+#   python bench/bench_matchlog.py [games] [rate_per_sec]
+#
+# Works on a temporary copy of instance/ox_app.db. First writes `games`
+# finished games one commit each on the caller's thread, as a handler
+# writing its own result would (the time that move would wait), then the
+# same games through MatchLog.record() as fast as possible, and finally at
+# a steady `rate_per_sec`. Reports the caller's cost per game, the rows the
+# writer thread sustained per second, and its batch sizes, flush latency
+# and deepest queue.
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gamestate
+import matchlog
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'ox_app.db')
+LINE = [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)]
+
+
+def finished(n):
+    game = gamestate.Game(f'M{n:07d}')
+    game.seat('X', f'x{n}')
+    game.seat('O', f'o{n}')
+    now = time.time()
+    for i, (r, c) in enumerate(LINE):
+        game.record_move('XO'[i % 2], r * 3 + c, now)
+    game.winner = 'X'
+    return game
+
+
+def fresh_db(tmp, name):
+    path = os.path.join(tmp, name)
+    if os.path.exists(SOURCE):
+        shutil.copy(SOURCE, path)
+    return path
+
+
+def inline(path, games):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(matchlog.SCHEMA)
+    start = time.perf_counter()
+    for game in games:
+        conn.execute(matchlog.UPSERT, matchlog._row(game.game_id, game.round_start_time, game.winner,
+                                                    game.history(), game.player_names))
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def behind(path, games, rate=None):
+    log = matchlog.MatchLog(path)
+    deepest = 0
+    caller = 0.0
+    start = time.perf_counter()
+    for i, game in enumerate(games):
+        if rate:
+            # Hold a steady arrival rate
+            wait = start + i / rate - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        t = time.perf_counter()
+        log.record(game)
+        caller += time.perf_counter() - t
+        deepest = max(deepest, log.queue.qsize())
+    log.close()
+    elapsed = time.perf_counter() - start
+    return caller, elapsed, deepest, log.stats()
+
+
+def count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM "match"').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    games = [finished(n) for n in range(total)]
+    print(f'{total} finished games')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = fresh_db(tmp, 'inline.db')
+        elapsed = inline(path, games)
+        print(f'inline       {elapsed / total * 1e6:8.1f} us per game on the move path, '
+              f'{total / elapsed:8.0f} rows/sec, {count(path)} rows')
+
+        for name, arrival in (('burst', None), (f'{rate:.0f}/sec', rate)):
+            path = fresh_db(tmp, f'behind-{name.replace("/", "-")}.db')
+            caller, elapsed, deepest, stats = behind(path, games[:int(rate * 5)] if arrival else games, arrival)
+            rows = stats['written']
+            print(f'{name:<12} {caller / rows * 1e6:8.1f} us per game on the move path, '
+                  f'{rows / elapsed:8.0f} rows/sec, {count(path)} rows in {stats["batches"]} batches, '
+                  f'flush avg {stats["flush_ms_avg"]:.2f} ms max {stats["flush_ms_max"]:.2f} ms, '
+                  f'deepest queue {deepest}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Matchmaker throughput and time-to-match.
+#
+#   python bench/bench_matchmaking.py [joins_per_sec] [seconds] [queues]
+#
+# Replays Poisson arrivals with normally distributed ratings against a
+# simulated clock, sweeping once per simulated second as the app does, and
+# reports time-to-match percentiles, the rating gap of the pairings, and how
+# many joins per second of real CPU the matchmaker sustains.
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matchmaking
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+    queue_count = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    rng = random.Random(1)
+    queues = [('standard', 'classic'), ('connect4', 'classic'), ('gomoku', 'classic'),
+              ('standard', 'dark'), ('standard', 'neon'), ('gomoku', 'dark')][:queue_count]
+
+    now = [0.0]
+    mm = matchmaking.Matchmaker(clock=lambda: now[0])
+    waits, gaps = [], []
+
+    def record(a, b):
+        waits.append(now[0] - a.joined_at)
+        waits.append(now[0] - b.joined_at)
+        gaps.append(abs(a.rating - b.rating))
+        mm.claim(a.token)
+        mm.claim(b.token)
+
+    joins = 0
+    busy = 0.0
+    next_sweep = 1.0
+    while now[0] < seconds:
+        now[0] += rng.expovariate(rate)
+        if now[0] >= next_sweep:
+            start = time.perf_counter()
+            for a, b in mm.sweep():
+                record(a, b)
+            busy += time.perf_counter() - start
+            next_sweep += 1.0
+        token = f't{joins}'
+        rating = int(rng.gauss(1200, 250))
+        queue = queues[rng.randrange(len(queues))]
+        start = time.perf_counter()
+        opponent = mm.join(token, token, rating, queue)
+        if opponent is not None:
+            record(opponent, mm.tickets[token])
+        busy += time.perf_counter() - start
+        joins += 1
+
+    waits.sort()
+    gaps.sort()
+    print(f'{joins} joins over {seconds:.0f}s simulated ({rate:.0f}/s into {len(queues)} queues)')
+    print(f'{"matched":>16}: {len(waits)} players, {mm.stats()["waiting"]} still waiting')
+    print(f'{"time to match":>16}: p50 {percentile(waits, 0.5) * 1000:7.1f} ms  '
+          f'p90 {percentile(waits, 0.9) * 1000:7.1f} ms  p99 {percentile(waits, 0.99) * 1000:7.1f} ms  '
+          f'max {waits[-1] * 1000:7.1f} ms')
+    print(f'{"rating gap":>16}: p50 {percentile(gaps, 0.5):5d}  p90 {percentile(gaps, 0.9):5d}  '
+          f'p99 {percentile(gaps, 0.99):5d}')
+    print(f'{"throughput":>16}: {joins / busy:,.0f} joins/sec of CPU ({busy / joins * 1e6:.2f} us/join)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# Memory per game: the old 15-key dict layout vs the slotted gamestate.Game.
+#
+#   python bench/bench_memory.py [games] [moves_per_game]
+#
+# Both layouts are filled with the same moves and measured with tracemalloc,
+# so the numbers include every nested list, dict, string and float a game
+# owns. Multiply bytes/game by the expected number of concurrent games (plus
+# interpreter and Socket.IO session overhead) to size a host. On CPython
+# 3.11 with 7 moves per game the dict layout is about 3.0 KB per game and
+# the Game object about 0.7 KB, so 100k concurrent games need about 65 MiB
+# of game state instead of about 285 MiB.
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gamestate
+
+
+def legacy_game(moves):
+    game = {
+        'board': [[' ', ' ', ' '] for _ in range(3)],
+        'players': ['X', 'O'],
+        'player_names': {'X': 'Player X', 'O': 'Player O'},
+        'current_player': 'X',
+        'winner': None,
+        'winning_cells': [],
+        'scores': {'X': 0, 'O': 0},
+        'move_history': [],
+        'game_start_time': time.time(),
+        'last_move_time': time.time(),
+        'time_controls': None,
+        'theme': 'classic',
+        'game_mode': 'standard',
+        'spectators': []
+    }
+    player = 'X'
+    for cell in moves:
+        r, c = divmod(cell, 3)
+        game['board'][r][c] = player
+        game['move_history'].append({'player': player, 'row': r, 'col': c, 'timestamp': time.time()})
+        player = 'O' if player == 'X' else 'X'
+    return game
+
+
+def slotted_game(game_id, moves):
+    game = gamestate.Game(game_id)
+    game.seat('X', 'Player X')
+    game.seat('O', 'Player O')
+    player = 'X'
+    for n, cell in enumerate(moves, 1):
+        game.move_count = n
+        game.rules.play(game.bits, player, cell, n)
+        game.record_move(player, cell, time.time())
+        player = 'O' if player == 'X' else 'X'
+    return game
+
+
+def measure(build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the games is not part of any game
+    return (after - before - sys.getsizeof(keep)) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    per_game = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    rng = random.Random(1)
+    orders = [rng.sample(range(9), 9)[:per_game] for _ in range(count)]
+    ids = [f'G{i:05d}' for i in range(count)]
+
+    legacy = measure(lambda i: legacy_game(orders[i]), count)
+    # Game ids are shared by both layouts as dict keys, so they are built up front
+    slotted = measure(lambda i: slotted_game(ids[i], orders[i]), count)
+    print(f'{count} games, {per_game} moves each')
+    print(f'{"dict layout":>14}: {legacy:8.0f} bytes/game  ({legacy * 100000 / 2**20:6.1f} MiB per 100k games)')
+    print(f'{"Game object":>14}: {slotted:8.0f} bytes/game  ({slotted * 100000 / 2**20:6.1f} MiB per 100k games)')
+    print(f'{"saving":>14}: {legacy / slotted:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
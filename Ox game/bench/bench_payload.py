@@ -0,0 +1,58 @@
+# Bytes per move on the wire: full game_update snapshots vs game_delta.
+#
+#   python bench/bench_payload.py [game_mode]
+#
+# Plays one long game and prints the JSON size of what the room would
+# receive for each move under both protocols.
+
+import json
+import os
+import random
+import sys
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+# Before app, so the run writes nothing under instance/
+import isolate_db
+
+import app
+import gamestate
+
+
+def size(payload):
+    return len(json.dumps(payload, separators=(',', ':')))
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'gomoku'
+    game = gamestate.Game('BENCH1', mode)
+    game.seat('X', 'Player X')
+    game.seat('O', 'Player O')
+    cells = list(range(game.rules.cells))
+    random.Random(1).shuffle(cells)
+
+    rows = []
+    player = 'X'
+    for n, cell in enumerate(cells, 1):
+        app._apply_move(game, player, cell)
+        rows.append((n, size(app._pack_game(game)), size(app._pack_delta(game, player, cell))))
+        if game.winner:
+            break
+        player = 'O' if player == 'X' else 'X'
+
+    print(f'{mode}: {len(rows)} moves')
+    print(f'{"move":>6} {"snapshot":>10} {"delta":>8}')
+    step = max(1, len(rows) // 10)
+    sample = rows[::step]
+    if sample[-1] is not rows[-1]:
+        sample.append(rows[-1])
+    for n, snap, delta in sample:
+        print(f'{n:>6} {snap:>10} {delta:>8}')
+    total_snap = sum(r[1] for r in rows)
+    total_delta = sum(r[2] for r in rows)
+    print(f'{"total":>6} {total_snap:>10} {total_delta:>8}  ({total_snap / total_delta:.1f}x fewer bytes)')
+
+
+if __name__ == '__main__':
+    main()
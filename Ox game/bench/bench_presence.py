@@ -0,0 +1,88 @@
+# player_count messages sent during a reconnect storm.
+#
+#   python bench/bench_presence.py [clients] [storm_seconds] [subscribed_percent]
+#
+# `clients` Socket.IO test clients connect, then all of them drop and
+# reconnect over `storm_seconds` (as after a deploy). Counts the player_count
+# messages the clients received in three setups:
+#   per-event    every socket gets the count on every connect and disconnect
+#                (the old behaviour)
+#   coalesced    every socket subscribes; at most one count per interval
+#   opt-in       coalesced, and only `subscribed_percent` of sockets subscribe
+#                (those with the home page open)
+# CPU time covers the server and the in-process test clients together.
+
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+# Before app, so the run writes nothing under instance/
+import isolate_db
+
+import app
+
+WAVES = 20
+
+
+def connect(subscribe):
+    client = app.socketio.test_client(app.app)
+    if subscribe:
+        client.emit('subscribe_presence')
+    return client
+
+
+def storm(clients, seconds, subscribed):
+    # Initial connects, then everyone reconnects in waves spread over `seconds`
+    every = max(1, round(100 / subscribed)) if subscribed else 0
+    wanted = [bool(every) and i % every == 0 for i in range(clients)]
+    start = time.process_time()
+    sockets = []
+    for i in range(clients):
+        sockets.append(connect(wanted[i]))
+    app.socketio.sleep(app.PRESENCE_INTERVAL * 2)
+    received = sum(count(s) for s in sockets)
+    per_wave = -(-clients // WAVES)
+    for w in range(0, clients, per_wave):
+        for i in range(w, min(w + per_wave, clients)):
+            received += count(sockets[i])
+            sockets[i].disconnect()
+            sockets[i] = connect(wanted[i])
+        app.socketio.sleep(seconds / WAVES)
+    app.socketio.sleep(app.PRESENCE_INTERVAL * 2)
+    received += sum(count(s) for s in sockets)
+    cpu = time.process_time() - start
+    for s in sockets:
+        s.disconnect()
+    app.socketio.sleep(app.PRESENCE_INTERVAL * 2)
+    return received, cpu
+
+
+def count(client):
+    return sum(1 for m in client.get_received() if m['name'] == 'player_count')
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 4
+    subscribed = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    print(f'{clients} clients, reconnect storm over {seconds:.0f}s, '
+          f'{app.PRESENCE_INTERVAL:.0f}s presence interval')
+    print(f'{"setup":>10} {"messages":>9} {"per client":>11} {"cpu s":>6}')
+
+    coalesced = app._presence_changed
+
+    def per_event():
+        app._broadcast('player_count', app.store.client_count(), app.PRESENCE_ROOM)
+
+    for name, changed, percent in (('per-event', per_event, 100), ('coalesced', coalesced, 100),
+                                   ('opt-in', coalesced, subscribed)):
+        app._presence_changed = changed
+        received, cpu = storm(clients, seconds, percent)
+        print(f'{name:>10} {received:>9} {received / clients:>11.1f} {cpu:>6.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Cost of the socket event rate limits.
+#
+#   python bench/bench_ratelimit.py [calls]
+#
+# Times RateLimiter.allow() on the accepted path (a sid and game well under
+# their limits) and on the drop path (a flooding sid), then the gate that
+# throttled() wraps around a no-op handler for a seated sid, against calling
+# that handler directly. Finally a test client joins a game's X seat, floods
+# it with make_move and shows what got through.
+
+import os
+import sys
+import time
+import timeit
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+# Before app, so the run writes nothing under instance/
+import isolate_db
+
+import app
+import gamestate
+import ratelimit
+
+
+def per_call(stmt, calls):
+    return min(timeit.repeat(stmt, number=calls, repeat=5)) / calls
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    limits = {'make_move': {'sid': [1e9, 1e9], 'room': [1e9, 1e9]}, 'send_chat': {'sid': [1e-9, 1]}}
+    limiter = ratelimit.RateLimiter(limits)
+    limiter.allow('send_chat', 'flood')
+    accepted = per_call(lambda: limiter.allow('make_move', 'sid1', 'GAME01'), calls)
+    dropped = per_call(lambda: limiter.allow('send_chat', 'flood', 'GAME01'), calls)
+    unlimited = per_call(lambda: limiter.allow('leave_game', 'sid1', 'GAME01'), calls)
+    print(f'allow(): accepted {accepted * 1e9:.0f} ns, dropped {dropped * 1e9:.0f} ns, '
+          f'unlimited event {unlimited * 1e9:.0f} ns')
+
+    app.rate_limiter = limiter
+    payload = {'game_id': 'GAME01', 'row': 0, 'col': 0}
+
+    def handler(data):
+        return data
+
+    gate = app.throttled('make_move')(handler)
+    app.connected.bind('sid1', 'GAME01', 'X', 'x')
+    with app.app.test_request_context():
+        app.request.sid = 'sid1'
+        bare = per_call(lambda: handler(payload), calls)
+        gated = per_call(lambda: gate(payload), calls)
+    app.connected.release('sid1')
+    print(f'handler: bare {bare * 1e9:.0f} ns, gated {gated * 1e9:.0f} ns, '
+          f'overhead {(gated - bare) * 1e9:.0f} ns')
+
+    app.rate_limiter = ratelimit.RateLimiter(app.RATE_LIMITS)
+    game = gamestate.Game('FLOOD1')
+    game.seat('X', 'x')
+    game.seat('O', 'o')
+    app.store.save_game(game)
+    client = app.socketio.test_client(app.app)
+    client.emit('join_game', {'game_id': 'FLOOD1', 'player': 'X', 'player_name': 'x'})
+    client.get_received()
+    start = time.perf_counter()
+    for i in range(1000):
+        client.emit('make_move', {'game_id': 'FLOOD1', 'player': 'X', 'row': 0, 'col': 0})
+    elapsed = time.perf_counter() - start
+    replies = sum(1 for m in client.get_received() if m['name'] in ('game_delta', 'invalid_move'))
+    print(f'flood of 1000 make_move in {elapsed * 1000:.0f} ms: {replies} handled, '
+          f'counters {app.rate_limiter.stats()["make_move"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# What a player's page receives when its socket drops and reconnects,
+# rejoining from scratch versus resuming from its last seq.
+#
+#   python bench/bench_resume.py [missed_moves] [chat_messages]
+#
+# Two players are in a game with `chat_messages` chat messages in it; one
+# socket drops, the other plays `missed_moves` moves and the first comes
+# back on a new socket, once as a fresh join (snapshot and chat backlog,
+# which is how the page reconnected before) and once resuming with the seq
+# and chat timestamp it had. Counts the events and wire bytes the
+# reconnecting socket received, for 3x3 and 15x15 boards.
+
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+# Before app, so the run writes nothing under instance/
+import isolate_db
+
+import app
+import ratelimit
+import wire
+
+
+def new_game(mode, chat):
+    x = app.app.test_client()
+    o = app.app.test_client()
+    game_id = x.post('/create', data={'player_name': 'alice', 'game_mode': mode}).location.split('/')[-1]
+    o.post('/join', data={'game_id': game_id, 'player_name': 'bob'})
+    sockets = {}
+    for player, http, name in (('X', x, 'alice'), ('O', o, 'bob')):
+        sockets[player] = app.socketio.test_client(app.app, flask_test_client=http)
+        sockets[player].emit('join_game', {'game_id': game_id, 'player': player, 'player_name': name})
+    for n in range(chat):
+        sockets['X'].emit('send_chat', {'game_id': game_id, 'player': 'X', 'player_name': 'alice',
+                                        'message': f'message number {n}'})
+    received = sockets['O'].get_received()
+    seen = max(m['args'][0]['timestamp'] for m in received if m['name'] == 'chat_message') if chat else None
+    return game_id, sockets, o, seen
+
+
+def reconnect(mode, missed, chat, resume):
+    game_id, sockets, http, chat_seen = new_game(mode, chat)
+    seq = app.store.get_game(game_id).seq
+    sockets['O'].disconnect()
+    size = app.store.get_game(game_id).rules.size
+    for n in range(missed):
+        # O's seat is still held, so X's socket plays both sides
+        player = app.store.get_game(game_id).current_player
+        sockets['X'].emit('make_move', {'game_id': game_id, 'player': player,
+                                        'row': n // size, 'col': n % size})
+    client = app.socketio.test_client(app.app, flask_test_client=http)
+    client.get_received()
+    join = {'game_id': game_id, 'player': 'O', 'player_name': 'bob'}
+    if resume:
+        join.update(seq=seq, chat_seen=chat_seen)
+    client.emit('join_game', join)
+    received = [m for m in client.get_received() if m['name'] != 'viewer_count']
+    size = sum(len(wire.dumps([m['name']] + m['args'])) for m in received)
+    client.disconnect()
+    sockets['X'].disconnect()
+    return len(received), size, [m['name'] for m in received]
+
+
+def main():
+    missed = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    chat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    app.rate_limiter = ratelimit.RateLimiter({})
+    print(f'{missed} missed moves, {chat} chat messages')
+    print(f'{"board":>8} {"reconnect":>10} {"events":>7} {"bytes":>7}  received')
+    for mode in ('standard', 'gomoku'):
+        for name, resume in (('rejoin', False), ('resume', True)):
+            events, size, names = reconnect(mode, missed, chat, resume)
+            print(f'{mode:>8} {name:>10} {events:>7} {size:>7}  {" ".join(names)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# Encode cost of game_update under request_state load, with and without the
+# per-game snapshot cache.
+#
+#   python bench/bench_snapshot.py [games] [requests_per_change]
+#
+# Each game changes once per round and is then asked for its state by
+# requests_per_change clients, the pattern of a room reconnecting or of
+# clients polling request_state.
+
+import json
+import os
+import random
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+# Before app, so the run writes nothing under instance/
+import isolate_db
+
+import app
+import gamestate
+import wire
+
+
+def make_games(count):
+    games = []
+    for i in range(count):
+        game = gamestate.Game(f'B{i:05d}')
+        game.seat('X', 'Player X')
+        game.seat('O', 'Player O')
+        games.append(game)
+    return games
+
+
+def run(games, requests, rounds, cached, rng):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for game in games:
+            if game.winner or game.move_count == game.rules.cells:
+                game.reset()
+            free = [c for c in range(game.rules.cells) if not (game.bits[0] | game.bits[1]) >> c & 1]
+            app._apply_move(game, game.current_player, rng.choice(free))
+            for _ in range(requests):
+                if cached:
+                    wire.dumps(['game_update', app._snapshot(game)], separators=(',', ':'))
+                else:
+                    json.dumps(['game_update', app._pack_game(game)], separators=(',', ':'))
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rounds = 5
+
+    uncached = run(make_games(count), requests, rounds, False, random.Random(1))
+    app.snapshot_stats.update(encoded=0, reused=0)
+    cached = run(make_games(count), requests, rounds, True, random.Random(1))
+
+    stats = app.snapshot_stats
+    served = stats['encoded'] + stats['reused']
+    print(f'{count} games x {rounds} changes x {requests} state requests = {served} snapshots served')
+    print(f'{"pack + encode":>16}: {uncached / served * 1e6:7.2f} us/request')
+    print(f'{"cached encoding":>16}: {cached / served * 1e6:7.2f} us/request')
+    print(f'{"encodes":>16}: {stats["encoded"]}  reused: {stats["reused"]}  '
+          f'avoidance ratio: {stats["reused"] / served:.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# Player move latency with spectators in the players' room versus in their
+# own coalesced watch room.
+#
+#   python bench/bench_spectators.py [spectators] [moves]
+#
+# Two players play `moves` moves (resetting when a game ends) while
+# `spectators` Socket.IO test clients watch, in two setups:
+#   shared room   watchers join the game's own room, as spectators used to
+#                 (through join_players_room, registered here as a bench
+#                 event since join_game no longer does this), and get every
+#                 delta, join and snapshot the players get
+#   watch room    watchers join as spectators and get at most one
+#                 game_update per SPECTATOR_INTERVAL
+# Reports the time make_move takes to handle and fan out (test clients are
+# served in-process, so this includes delivery), the frames the watchers
+# received in all and the time the joins took.
+
+import os
+import statistics
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+# Before app, so the run writes nothing under instance/
+import isolate_db
+
+import app
+import ratelimit
+
+MOVES = [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)]
+
+
+@app.socketio.on('bench_join_players_room')
+def join_players_room(data):
+    # join_game's spectator path before the watch room: into the players'
+    # room, announced there with a fresh snapshot for everyone
+    game_id = data['game_id']
+    with app.game_locks(game_id):
+        game = app.store.get_game(game_id)
+        app.join_room(app._game_room(game_id, app.request.sid))
+        app._broadcast('spectator_joined', {'player_name': data['player_name']}, game_id)
+        app._save(game)
+        app._broadcast_snapshot(game_id, game)
+    app._send('chat_history', app.store.chat_history(game_id, app.CHAT_BACKLOG))
+
+
+def new_game():
+    x = app.app.test_client()
+    o = app.app.test_client()
+    game_id = x.post('/create', data={'player_name': 'alice', 'game_mode': 'standard'}).location.split('/')[-1]
+    o.post('/join', data={'game_id': game_id, 'player_name': 'bob'})
+    players = {}
+    for player, http, name in (('X', x, 'alice'), ('O', o, 'bob')):
+        players[player] = app.socketio.test_client(app.app, flask_test_client=http)
+        players[player].emit('join_game', {'game_id': game_id, 'player': player, 'player_name': name})
+    return game_id, players
+
+
+def run(spectators, moves, event, role):
+    game_id, players = new_game()
+    start = time.perf_counter()
+    watchers = []
+    for i in range(spectators):
+        client = app.socketio.test_client(app.app)
+        client.emit(event, {'game_id': game_id, 'player': role, 'player_name': f'viewer{i}'})
+        watchers.append(client)
+    joined = time.perf_counter() - start
+    for client in watchers:
+        client.get_received()
+    timings = []
+    for n in range(moves):
+        if n % len(MOVES) == 0 and n:
+            players['X'].emit('request_reset', {'game_id': game_id})
+        # Whoever moves first in a round plays the winning line
+        player = app.store.get_game(game_id).current_player
+        row, col = MOVES[n % len(MOVES)]
+        start = time.perf_counter()
+        players[player].emit('make_move', {'game_id': game_id, 'player': player, 'row': row, 'col': col})
+        timings.append(time.perf_counter() - start)
+        app.socketio.sleep(0)
+    app.socketio.sleep(app.SPECTATOR_INTERVAL * 2)
+    frames = sum(len(client.get_received()) for client in watchers)
+    for client in watchers + list(players.values()):
+        client.disconnect()
+    return statistics.median(timings), max(timings), frames, joined
+
+
+def main():
+    spectators = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    moves = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    app.rate_limiter = ratelimit.RateLimiter({})
+    print(f'{spectators} spectators, {moves} moves, {app.SPECTATOR_INTERVAL}s spectator interval')
+    print(f'{"setup":>11} {"watchers":>9} {"move ms p50":>12} {"max":>7} {"frames":>8} {"join s":>7}')
+    for count in (0, spectators):
+        for name, event in (('shared room', 'bench_join_players_room'), ('watch room', 'join_game')):
+            median, worst, frames, joined = run(count, moves, event, 'spectator')
+            print(f'{name:>11} {count:>9} {median * 1000:>12.2f} {worst * 1000:>7.2f} {frames:>8} {joined:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# Bytes and CPU per message: JSON vs MessagePack.
+#
+#   python bench/bench_wire.py [game_mode] [repeat]
+#
+# Plays one long game and, for every move, measures the game_delta the room
+# receives and the full game_update a (re)joining client receives, in both
+# wire formats. Encode and decode times are the server and client cost of
+# one message; the binary snapshot carries the board as one byte per cell.
+
+import json
+import os
+import random
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+# Before app, so the run writes nothing under instance/
+import isolate_db
+
+import msgpack
+
+import app
+import gamestate
+
+
+def timed(fn, values, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for v in values:
+            fn(v)
+    return (time.perf_counter() - start) / (repeat * len(values)) * 1e6
+
+
+def compare(label, json_payloads, binary_payloads, repeat):
+    as_json = [json.dumps(p, separators=(',', ':')) for p in json_payloads]
+    as_binary = [msgpack.packb(p, use_bin_type=True) for p in binary_payloads]
+    json_bytes = sum(len(s.encode()) for s in as_json) / len(as_json)
+    binary_bytes = sum(len(b) for b in as_binary) / len(as_binary)
+    print(f'{label}')
+    print(f'{"":>4}{"format":<10} {"bytes":>9} {"encode us":>10} {"decode us":>10}')
+    print(f'{"":>4}{"json":<10} {json_bytes:>9.0f} '
+          f'{timed(lambda p: json.dumps(p, separators=(",", ":")), json_payloads, repeat):>10.2f} '
+          f'{timed(json.loads, as_json, repeat):>10.2f}')
+    print(f'{"":>4}{"msgpack":<10} {binary_bytes:>9.0f} '
+          f'{timed(lambda p: msgpack.packb(p, use_bin_type=True), binary_payloads, repeat):>10.2f} '
+          f'{timed(lambda b: msgpack.unpackb(b, raw=False), as_binary, repeat):>10.2f}')
+    print(f'{"":>4}{json_bytes / binary_bytes:.2f}x fewer bytes with msgpack')
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'gomoku'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    game = gamestate.Game('BENCH1', mode)
+    game.seat('X', 'Player X')
+    game.seat('O', 'Player O')
+    cells = list(range(game.rules.cells))
+    random.Random(1).shuffle(cells)
+
+    deltas, snapshots, binary_snapshots = [], [], []
+    player = 'X'
+    for cell in cells:
+        app._apply_move(game, player, cell)
+        deltas.append(app._pack_delta(game, player, cell))
+        snapshots.append(app._pack_game(game))
+        binary_snapshots.append(app._pack_game(game, binary=True))
+        if game.winner:
+            break
+        player = 'O' if player == 'X' else 'X'
+
+    print(f'{mode}: {len(deltas)} moves, {repeat} repeats')
+    compare('game_delta', deltas, deltas, repeat)
+    compare('game_update', snapshots, binary_snapshots, max(1, repeat // 10))
+
+
+if __name__ == '__main__':
+    main()
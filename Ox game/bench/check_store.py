@@ -0,0 +1,133 @@
+# Runs the same checks against every storage backend, then times them.
+#
+#   python bench/check_store.py [games]
+#
+# Redis is exercised through bench/resp_standin.py and SQLite through a
+# temporary database, so nothing outside /tmp is touched. For the durable
+# backends a second store instance plays the part of another worker
+# process and must see everything the first one wrote.
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gamestate
+import storage
+from resp_standin import RespStandin
+
+
+def play(game, cells):
+    player = 'X'
+    for n, cell in enumerate(cells, 1):
+        game.move_count = n
+        winner, winning_cells = game.rules.play(game.bits, player, cell, n)
+        game.record_move(player, cell, time.time())
+        if winner:
+            game.winner, game.winning_cells = winner, winning_cells
+            if winner != 'Tie':
+                game.add_score(winner)
+            break
+        player = 'O' if player == 'X' else 'X'
+        game.current_player = player
+
+
+def check(name, store, peer):
+    game = gamestate.Game('CHK001', 'connect4', 'dark')
+    game.seat('X', 'alice')
+    game.seat('O', 'bob')
+    play(game, [3, 10, 4, 11, 5, 12, 6])
+    game.search = 'in flight'
+    store.save_game(game)
+
+    same = store.get_game('CHK001')
+    assert same is game and same.search == 'in flight', 'live object is kept'
+    other = peer.get_game('CHK001')
+    for field in gamestate.STATE_FIELDS + ('bits',):
+        assert list_or(getattr(other, field)) == list_or(getattr(game, field)), field
+    assert other.moves == game.moves and other.rules is game.rules
+    assert other.winner == 'X' and other.history() == game.history()
+    assert other.last_active == game.last_active
+    assert store.get_game('NOPE00') is None
+
+    for i in range(storage.CHAT_LIMIT + 20):
+        store.add_chat('CHK001', {'player': 'X', 'message': f'm{i}'})
+    history = peer.chat_history('CHK001')
+    assert len(history) == storage.CHAT_LIMIT and history[-1]['message'] == f'm{storage.CHAT_LIMIT + 19}'
+    assert [m['message'] for m in peer.chat_history('CHK001', 2)] == [
+        f'm{storage.CHAT_LIMIT + 18}', f'm{storage.CHAT_LIMIT + 19}']
+
+    store.record_result('alice', 'wins')
+    peer.record_result('alice', 'losses')
+    assert store.player_stats('alice') == {'wins': 1, 'losses': 1, 'ties': 0, 'games_played': 2}
+    assert peer.player_stats('nobody')['games_played'] == 0
+
+    assert store.add_client('sid1') == 1 and peer.add_client('sid2') == 2
+    assert store.remove_client('sid1') == 1 and peer.client_count() == 1
+    peer.remove_client('sid2')
+
+    assert peer.game_count() == 1 and peer.game_ids() == ['CHK001']
+    assert store.footprint() > 0
+    store.delete_game('CHK001')
+    store.clear_chat('CHK001')
+    assert peer.get_game('CHK001') is None and peer.chat_history('CHK001') == []
+    assert store.game_count() == 0
+    print(f'{name:>8}: ok')
+
+
+def list_or(value):
+    return [list_or(v) for v in value] if isinstance(value, (list, tuple)) else value
+
+
+def timed(name, store, count):
+    game_ids = [f'T{i:05d}' for i in range(count)]
+    start = time.perf_counter()
+    for game_id in game_ids:
+        game = gamestate.Game(game_id)
+        game.seat('X', 'alice')
+        game.seat('O', 'bob')
+        store.save_game(game)
+    saves = time.perf_counter() - start
+    start = time.perf_counter()
+    for game_id in game_ids:
+        store.get_game(game_id)
+    loads = time.perf_counter() - start
+    start = time.perf_counter()
+    for game_id in game_ids:
+        store.add_chat(game_id, {'player': 'X', 'message': 'hello'})
+    chats = time.perf_counter() - start
+    for game_id in game_ids:
+        store.delete_game(game_id)
+        store.clear_chat(game_id)
+    print(f'{name:>8}: save {saves / count * 1e6:7.1f} us  get {loads / count * 1e6:7.1f} us  '
+          f'chat {chats / count * 1e6:7.1f} us')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    server = RespStandin().start()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ox_app.db')
+        memory = storage.MemoryStore()
+        backends = [
+            ('memory', memory, memory),
+            ('sqlite', storage.SQLiteStore(path), storage.SQLiteStore(path)),
+            ('redis', storage.RedisStore('127.0.0.1', server.port),
+             storage.RedisStore('127.0.0.1', server.port)),
+        ]
+        for name, store, peer in backends:
+            check(name, store, peer)
+        print(f'{count} games per backend')
+        for name, store, _ in backends:
+            timed(name, store, count)
+        for _, store, peer in backends[1:]:
+            store.conn.close()
+            peer.conn.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
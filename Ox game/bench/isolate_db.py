@@ -0,0 +1,23 @@
+# Keeps bench runs out of instance/ox_app.db.
+#
+# Imported before `app`, this points the match log (OX_MATCH_DB) at a
+# temporary directory that is removed at exit, and moves a plain
+# OX_STORE=sqlite store there too. Benches that start their own servers
+# pass path() files in the child's environment.
+
+import atexit
+import os
+import shutil
+import tempfile
+
+DIR = tempfile.mkdtemp(prefix='ox-bench-')
+atexit.register(shutil.rmtree, DIR, True)
+
+
+def path(name):
+    return os.path.join(DIR, name)
+
+
+os.environ['OX_MATCH_DB'] = path('match.db')
+if os.environ.get('OX_STORE') == 'sqlite':
+    os.environ['OX_STORE'] = f'sqlite:///{path("ox_app.db")}'
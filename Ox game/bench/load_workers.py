@@ -0,0 +1,172 @@
+# Move throughput of the multi-worker server as the worker count grows.
+#
+#   python bench/load_workers.py [max_workers] [clients] [games_per_client] [seconds]
+#
+# For 1, 2, 4 ... max_workers workers this starts the pre-fork server on a
+# temporary SQLite store, seats games directly in that store, and runs
+# client processes that each play their games over raw Socket.IO websockets
+# (connecting to each game's owning worker, as the game page does). Every
+# move waits for its game_delta before the next one is sent on that game.
+# Throughput only scales while there are spare cores for both the workers
+# and the clients.
+
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import simple_websocket
+
+import cluster
+import gamestate
+import storage
+
+HOST = '127.0.0.1'
+
+
+class SocketIOClient:
+    # Just enough of Engine.IO 4 / Socket.IO 5 over a websocket for the load test
+    def __init__(self, port):
+        self.ws = simple_websocket.Client.connect(f'ws://{HOST}:{port}/socket.io/?EIO=4&transport=websocket')
+        self.ws.receive()
+        self.ws.send('40')
+        while not self.ws.receive().startswith('40'):
+            pass
+
+    def emit(self, event, payload):
+        self.ws.send('42' + json.dumps([event, payload]))
+
+    def wait(self, event, match=lambda data: True):
+        while True:
+            message = self.ws.receive()
+            if message == '2':
+                self.ws.send('3')
+            elif message.startswith('42'):
+                name, data = json.loads(message[2:])
+                if name == event and match(data):
+                    return data
+
+    def close(self):
+        self.ws.close()
+
+
+def play(port, workers, game_ids, seconds, results):
+    node = cluster.Cluster(HOST, port, workers, 0)
+    rng = random.Random(game_ids[0])
+    clients = {}
+    for game_id in game_ids:
+        client = SocketIOClient(node.port_of(node.owner(game_id)))
+        client.emit('join_game', {'game_id': game_id, 'player': 'X', 'player_name': 'load'})
+        state = client.wait('game_update')
+        clients[game_id] = [client, state['seq'], [c for c in range(9)], 'X']
+    moves = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        for game_id, entry in clients.items():
+            client, seq, free, player = entry
+            cell = free.pop(rng.randrange(len(free)))
+            client.emit('make_move', {'game_id': game_id, 'player': player, 'row': cell // 3, 'col': cell % 3})
+            delta = client.wait('game_delta', lambda d, s=seq: d['seq'] > s)
+            moves += 1
+            if delta['winner']:
+                client.emit('request_reset', {'game_id': game_id})
+                delta = client.wait('game_delta', lambda d: d.get('reset'))
+                entry[2] = list(range(9))
+            entry[1] = delta['seq']
+            entry[3] = delta['current_player']
+    for client, *_ in clients.values():
+        client.close()
+    results.put(moves)
+
+
+def free_port(count):
+    # A base port with `count` free ports after it
+    while True:
+        base = random.randrange(20000, 60000)
+        try:
+            for p in range(base, base + count + 1):
+                with socket.socket() as s:
+                    s.bind((HOST, p))
+            return base
+        except OSError:
+            continue
+
+
+def wait_until_serving(port):
+    # The master opens the sockets before forking, so wait for a worker to answer
+    for _ in range(200):
+        try:
+            urllib.request.urlopen(f'http://{HOST}:{port}/socket.io/?EIO=4&transport=polling', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'server on {port} did not start')
+
+
+def run(workers, clients, per_client, seconds, tmp):
+    path = os.path.join(tmp, f'ox-{workers}.db')
+    store = storage.SQLiteStore(path)
+    game_ids = []
+    for i in range(clients * per_client):
+        game = gamestate.Game(f'L{workers}{i:04d}')
+        game.seat('X', 'load')
+        game.seat('O', 'load')
+        store.save_game(game)
+        game_ids.append(game.game_id)
+
+    port = free_port(workers)
+    # Each game's client moves as fast as the server answers, so lift the rate limits
+    env = dict(os.environ, OX_STORE=f'sqlite:///{path}', OX_MATCH_DB=os.path.join(tmp, f'match-{workers}.db'),
+               OX_RATE_LIMITS='{}', PYTHONWARNINGS='ignore')
+    server = subprocess.Popen(
+        [sys.executable, '-c', 'import app, cluster; '
+         f'cluster.serve(app.app, {HOST!r}, {port}, {workers}, app._start_worker)'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    try:
+        for index in range(workers):
+            wait_until_serving(port + 1 + index)
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=play, args=(
+            port, workers, game_ids[i * per_client:(i + 1) * per_client], seconds, results))
+            for i in range(clients)]
+        for p in procs:
+            p.start()
+        total = sum(results.get(timeout=seconds + 60) for _ in procs)
+        for p in procs:
+            p.join()
+    finally:
+        server.terminate()
+        server.wait()
+    return total / seconds
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    per_client = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    seconds = float(sys.argv[4]) if len(sys.argv) > 4 else 5
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+
+    print(f'{os.cpu_count()} cpus, {clients} client processes x {per_client} games, {seconds:.0f}s per run')
+    print(f'{"workers":>8} {"moves/sec":>10} {"speedup":>8}')
+    with tempfile.TemporaryDirectory() as tmp:
+        base = None
+        for workers in counts:
+            rate = run(workers, clients, per_client, seconds, tmp)
+            base = base or rate
+            print(f'{workers:>8} {rate:>10.0f} {rate / base:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
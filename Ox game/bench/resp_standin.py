@@ -0,0 +1,195 @@
+# In-process stand-in for a Redis server, for trying storage.RedisStore
+# without installing Redis.
+#
+#   server = RespStandin().start()     # listens on 127.0.0.1, random port
+#   store = storage.RedisStore('127.0.0.1', server.port)
+#
+# Speaks RESP2 and implements only the commands the store uses, with
+# Redis's semantics for them. Each connection gets its own thread and all
+# of them share one keyspace behind a lock.
+
+import socket
+import socketserver
+import threading
+
+
+class RespStandin:
+    def __init__(self, host='127.0.0.1', port=0):
+        self.data = {}
+        self.lock = threading.Lock()
+        standin = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def setup(self):
+                super().setup()
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def handle(self):
+                while True:
+                    try:
+                        args = standin._read_command(self.rfile)
+                    except (ConnectionError, ValueError):
+                        return
+                    if args is None:
+                        return
+                    with standin.lock:
+                        reply = standin._dispatch(args)
+                    self.wfile.write(reply)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.server = Server((host, port), Handler)
+        self.port = self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def _read_command(rfile):
+        line = rfile.readline()
+        if not line:
+            return None
+        if line[:1] != b'*':
+            raise ValueError(line)
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int(rfile.readline()[1:-2])
+            args.append(rfile.read(size + 2)[:-2])
+        return args
+
+    @staticmethod
+    def _encode(value):
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, str):
+            return b'+%s\r\n' % value.encode()
+        if isinstance(value, bytes):
+            return b'$%d\r\n%s\r\n' % (len(value), value)
+        if isinstance(value, Exception):
+            return b'-ERR %s\r\n' % str(value).encode()
+        return b'*%d\r\n' % len(value) + b''.join(RespStandin._encode(v) for v in value)
+
+    def _typed(self, key, kind):
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise TypeError('WRONGTYPE Operation against a key holding the wrong kind of value')
+        return value
+
+    def _dispatch(self, args):
+        name = args[0].decode().upper()
+        handler = getattr(self, f'cmd_{name.lower()}', None)
+        if handler is None:
+            return self._encode(ValueError(f"unknown command '{name}'"))
+        try:
+            return self._encode(handler(*args[1:]))
+        except (TypeError, ValueError) as exc:
+            return self._encode(exc)
+
+    def cmd_ping(self, *args):
+        return args[0] if args else 'PONG'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        return 'OK'
+
+    def cmd_info(self, *sections):
+        # Only used_memory, taken as the length of every stored key and value
+        used = 0
+        for key, value in self.data.items():
+            if isinstance(value, dict):
+                value = [field + str(v).encode() for field, v in value.items()]
+            used += len(key) + (len(value) if isinstance(value, bytes) else sum(len(v) for v in value))
+        return f'# Memory\r\nused_memory:{used}\r\n'.encode()
+
+    def cmd_get(self, key):
+        return self._typed(key, bytes)
+
+    def cmd_set(self, key, value):
+        self.data[key] = value
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        return sum(self.data.pop(k, None) is not None for k in keys)
+
+    def cmd_exists(self, *keys):
+        return sum(k in self.data for k in keys)
+
+    def cmd_sadd(self, key, *members):
+        members_set = self._typed(key, set)
+        if members_set is None:
+            members_set = self.data[key] = set()
+        before = len(members_set)
+        members_set.update(members)
+        return len(members_set) - before
+
+    def cmd_srem(self, key, *members):
+        members_set = self._typed(key, set) or set()
+        before = len(members_set)
+        members_set.difference_update(members)
+        if not members_set:
+            self.data.pop(key, None)
+        return before - len(members_set)
+
+    def cmd_scard(self, key):
+        return len(self._typed(key, set) or ())
+
+    def cmd_smembers(self, key):
+        return sorted(self._typed(key, set) or ())
+
+    def cmd_rpush(self, key, *values):
+        items = self._typed(key, list)
+        if items is None:
+            items = self.data[key] = []
+        items.extend(values)
+        return len(items)
+
+    @staticmethod
+    def _span(length, start, stop):
+        start, stop = int(start), int(stop)
+        if start < 0:
+            start = max(0, length + start)
+        if stop < 0:
+            stop += length
+        return start, min(stop, length - 1)
+
+    def cmd_lrange(self, key, start, stop):
+        items = self._typed(key, list) or []
+        start, stop = self._span(len(items), start, stop)
+        return items[start:stop + 1]
+
+    def cmd_ltrim(self, key, start, stop):
+        items = self._typed(key, list)
+        if items is not None:
+            start, stop = self._span(len(items), start, stop)
+            items[:] = items[start:stop + 1]
+            if not items:
+                del self.data[key]
+        return 'OK'
+
+    def cmd_hincrby(self, key, field, amount):
+        fields = self._typed(key, dict)
+        if fields is None:
+            fields = self.data[key] = {}
+        fields[field] = int(fields.get(field, 0)) + int(amount)
+        return fields[field]
+
+    def cmd_hgetall(self, key):
+        fields = self._typed(key, dict) or {}
+        out = []
+        for field, value in fields.items():
+            out += [field, str(value).encode()]
+        return out
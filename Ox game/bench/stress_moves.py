@@ -0,0 +1,127 @@
+# Fires concurrent make_move/request_reset events at the same games from OS
+# threads and checks that every game stayed consistent.
+#
+#   python bench/stress_moves.py [games] [threads_per_game] [seconds] [--no-lock]
+#
+# The handlers run in the calling thread (through Socket.IO test clients),
+# with a tiny switch interval so threads interleave inside handlers, as
+# they would under threading async mode. Checked at the end, per game:
+#   - the board matches the move list, with no cell taken twice
+#   - moves alternate X, O, X ... and X is never more than one move ahead
+#   - every game_delta a client saw has seq exactly one above the previous
+#   - the game's scores equal both players' win/loss stats
+# --no-lock swaps the per-game locks for no-ops to show what they prevent.
+
+import os
+import random
+import sys
+import threading
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings('ignore')
+# Before app, so the run writes nothing under instance/
+import isolate_db
+
+import app
+import gamelocks
+import gamestate
+import ratelimit
+
+
+class NoLock:
+    def acquire(self, blocking=True):
+        return True
+
+    def release(self):
+        pass
+
+
+def worker(client, game_id, side, deadline, rng, counts):
+    while time.time() < deadline:
+        cell = rng.randrange(9)
+        client.emit('make_move', {'game_id': game_id, 'player': side, 'row': cell // 3, 'col': cell % 3})
+        if app.store.get_game(game_id).winner:
+            client.emit('request_reset', {'game_id': game_id})
+        counts[side] += 1
+
+
+def check(game, deltas):
+    problems = []
+    x, o = game.bits
+    if x & o:
+        problems.append('cell taken twice')
+    replay = [0, 0]
+    for i, word in enumerate(game.moves):
+        player = 1 if word & gamestate.PLAYER_BIT else 0
+        if player != i % 2:
+            problems.append(f'move {i + 1} played out of turn')
+        replay[player] |= 1 << (word & (gamestate.PLAYER_BIT - 1))
+    if replay != [x, o]:
+        problems.append('board does not match the move list')
+    if game.move_count != len(game.moves) or not 0 <= bin(x).count('1') - bin(o).count('1') <= 1:
+        problems.append('move count is off')
+    for seqs in deltas:
+        gaps = sum(1 for a, b in zip(seqs, seqs[1:]) if b != a + 1)
+        if gaps:
+            problems.append(f'{gaps} game_delta seq gaps or reorders seen by a client')
+            break
+    x_stats = app.store.player_stats(game.name_of('X'))
+    o_stats = app.store.player_stats(game.name_of('O'))
+    if (x_stats['wins'], o_stats['wins']) != tuple(game.scores) or \
+            (x_stats['losses'], o_stats['losses']) != (game.scores[1], game.scores[0]):
+        problems.append(f'scores {game.scores} vs stats X {x_stats} O {o_stats}')
+    return problems
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    game_count = int(args[0]) if len(args) > 0 else 8
+    per_game = int(args[1]) if len(args) > 1 else 4
+    seconds = float(args[2]) if len(args) > 2 else 5
+    locked = '--no-lock' not in sys.argv
+    # Handlers run on OS threads here, so they need OS-thread locks
+    app.game_locks = gamelocks.GameLocks(threading.Lock if locked else NoLock)
+    # The point is to flood the handlers, so nothing is rate limited
+    app.rate_limiter = ratelimit.RateLimiter({})
+    sys.setswitchinterval(1e-6)
+
+    clients, threads = {}, []
+    counts = {'X': 0, 'O': 0}
+    deadline = time.time() + seconds
+    for i in range(game_count):
+        game = gamestate.Game(f'S{i:05d}')
+        game.seat('X', f'x{i}')
+        game.seat('O', f'o{i}')
+        app.store.save_game(game)
+        for t in range(per_game):
+            client = app.socketio.test_client(app.app)
+            client.emit('join_game', {'game_id': game.game_id, 'player': 'spectator', 'player_name': f'c{t}'})
+            client.get_received()
+            clients.setdefault(game.game_id, []).append(client)
+            side = 'X' if t % 2 == 0 else 'O'
+            threads.append(threading.Thread(target=worker, args=(
+                client, game.game_id, side, deadline, random.Random(i * 100 + t), counts)))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    failed = 0
+    for game_id, game_clients in clients.items():
+        deltas = [[m['args'][0]['seq'] for m in c.get_received() if m['name'] == 'game_delta']
+                  for c in game_clients]
+        problems = check(app.store.get_game(game_id), deltas)
+        if problems:
+            failed += 1
+            print(f'{game_id}: ' + '; '.join(problems))
+    events = counts['X'] + counts['O']
+    print(f'{"locks" if locked else "no locks"}: {game_count} games x {per_game} threads, '
+          f'{events} make_move events in {seconds:.0f}s, lock stats {app.game_locks.stats()}')
+    print(f'{game_count - failed}/{game_count} games consistent')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# Multi-process serving: pre-forked eventlet workers plus a local message bus.
+#
+#   python app.py --workers 4 --port 5000
+#
+# The master opens the public listen socket, one private port per worker
+# (port + 1 + index) and the bus, then forks. Every worker serves plain HTTP
+# from the shared socket, where the kernel spreads connections across them.
+# Socket.IO traffic is sticky by game_id: a game's sockets all connect to
+# the private port of the worker that owns it (crc32(game_id) % workers),
+# so moves on one game are handled by one process and its room is local.
+# Game state lives in a shared store (sqlite or redis), so any worker can
+# serve a game's HTTP routes.
+#
+# Room emits that have to cross processes (player_count, matched, or an
+# emit from a worker that does not own the room) go through BusManager, a
+# python-socketio PubSubManager whose channel is the master's Unix-socket
+# broker: each frame a worker publishes is copied to every other worker.
+# Clients use the websocket transport only, because polling requests on
+# the shared socket could land on different workers.
+
+import os
+import pickle
+import signal
+import socket
+import struct
+import tempfile
+import threading
+import zlib
+
+import socketio
+
+FRAME = struct.Struct('!I')
+
+
+class Cluster:
+    def __init__(self, host, port, workers, index):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.index = index
+
+    def owner(self, game_id):
+        return zlib.crc32(game_id.encode()) % self.workers
+
+    def port_of(self, index):
+        return self.port + 1 + index
+
+
+def _recv_frame(sock):
+    header = _recv_exact(sock, FRAME.size)
+    if header is None:
+        return None
+    return _recv_exact(sock, FRAME.unpack(header)[0])
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 16))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class Broker:
+    # Runs in the master: copies each frame to every other connected worker
+    def __init__(self, path):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(64)
+        self.peers = {}
+        self.lock = threading.Lock()
+        self.frames = 0
+
+    def serve(self):
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.peers[conn] = threading.Lock()
+            threading.Thread(target=self._relay, args=(conn,), daemon=True).start()
+
+    def _relay(self, conn):
+        while True:
+            try:
+                frame = _recv_frame(conn)
+            except OSError:
+                frame = None
+            if frame is None:
+                break
+            data = FRAME.pack(len(frame)) + frame
+            self.frames += 1
+            with self.lock:
+                peers = [(p, lock) for p, lock in self.peers.items() if p is not conn]
+            for peer, lock in peers:
+                with lock:
+                    try:
+                        peer.sendall(data)
+                    except OSError:
+                        pass
+        with self.lock:
+            self.peers.pop(conn, None)
+        conn.close()
+
+    def close(self):
+        self.sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def _socket_module(async_mode):
+    # Sockets that yield to the worker's hub instead of blocking it
+    if async_mode == 'eventlet':
+        from eventlet.green import socket as green_socket
+        return green_socket
+    if async_mode == 'gevent':
+        from gevent import socket as green_socket
+        return green_socket
+    return socket
+
+
+class BusManager(socketio.PubSubManager):
+    name = 'bus'
+
+    def __init__(self, path, channel='socketio', logger=None):
+        super().__init__(channel=channel, logger=logger)
+        self.path = path
+        self.sock = None
+        self.outbox = None
+
+    def set_server(self, server):
+        # Connects before the worker serves anything, so no two tasks race to do it
+        super().set_server(server)
+        module = _socket_module(server.async_mode)
+        self.sock = module.socket(module.AF_UNIX, module.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+    def _publish(self, data):
+        # Frames only ever travel between this deployment's own workers. One
+        # writer task sends them, so frames from concurrent handlers never interleave
+        if self.outbox is None:
+            self.outbox = self.server.eio.create_queue()
+            self.server.start_background_task(self._write)
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        self.outbox.put(FRAME.pack(len(payload)) + payload)
+
+    def _write(self):
+        while True:
+            self.sock.sendall(self.outbox.get())
+
+    def _listen(self):
+        while True:
+            frame = _recv_frame(self.sock)
+            if frame is None:
+                return
+            yield pickle.loads(frame)
+
+
+def serve(app, host, port, workers, on_worker):
+    # Forks `workers` eventlet servers and relays their bus until interrupted
+    import eventlet
+    import eventlet.wsgi
+
+    shared = eventlet.listen((host, port))
+    private = [eventlet.listen((host, port + 1 + i)) for i in range(workers)]
+    bus_path = os.path.join(tempfile.gettempdir(), f'ox-bus-{os.getpid()}.sock')
+    broker = Broker(bus_path)
+
+    pids = []
+    for index in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            broker.sock.close()
+            for i, sock in enumerate(private):
+                if i != index:
+                    sock.close()
+            on_worker(Cluster(host, port, workers, index), bus_path)
+            pool = eventlet.GreenPool()
+            for sock in (shared, private[index]):
+                pool.spawn(eventlet.wsgi.server, sock, app, log_output=False)
+            pool.waitall()
+            os._exit(0)
+        pids.append(pid)
+
+    shared.close()
+    for sock in private:
+        sock.close()
+    broker.serve()
+
+    def stop(signum, frame):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        for _ in pids:
+            os.wait()
+    finally:
+        broker.close()
@@ -0,0 +1,58 @@
+# Which game, role and name each connected socket holds.
+#
+# join_game binds a sid to (game_id, role, name) and leave_game or a
+# disconnect releases it, each with one dict operation, so a dropped socket
+# is tied back to its game without looking at any game. Seats are also
+# counted per (game_id, role): a player's page may have several sockets over
+# time (a reconnect binds the new one before the old one is released) or at
+# once (two tabs), and a seat counts as abandoned only once none is left.
+#
+# The app does not free a seat the moment its last socket drops, as the page
+# may be about to resume on a new socket; it schedules the seat's departure
+# and frees it only if it is still unheld when that comes due.
+#
+# bind and release take a lock, as a reconnect's join and the old socket's
+# disconnect may run on two OS threads at once (OX_ASYNC_MODE=threading).
+
+import threading
+
+
+class Connections:
+    def __init__(self):
+        self.sockets = {}
+        self.held = {}
+        self.lock = threading.Lock()
+        self.released = 0
+
+    def bind(self, sid, game_id, role, name):
+        with self.lock:
+            self._release(sid)
+            self.sockets[sid] = (game_id, role, name)
+            seat = (game_id, role)
+            self.held[seat] = self.held.get(seat, 0) + 1
+
+    def release(self, sid):
+        # The sid's (game_id, role, name), or None if it held nothing
+        with self.lock:
+            return self._release(sid)
+
+    def _release(self, sid):
+        entry = self.sockets.pop(sid, None)
+        if entry is not None:
+            seat = entry[:2]
+            left = self.held[seat] - 1
+            if left:
+                self.held[seat] = left
+            else:
+                del self.held[seat]
+            self.released += 1
+        return entry
+
+    def get(self, sid):
+        return self.sockets.get(sid)
+
+    def holders(self, game_id, role):
+        return self.held.get((game_id, role), 0)
+
+    def stats(self):
+        return {'sockets': len(self.sockets), 'seats': len(self.held), 'released': self.released}
@@ -0,0 +1,111 @@
+# Bitboard game-state engine for N x N boards with K-in-a-row wins.
+#
+# Each side's position is an integer with one bit per cell: bit i is the
+# cell at (i // size, i % size), and a board is the pair [x_bits, o_bits].
+# A move can only complete a run of K on the four lines (row, column, both
+# diagonals) through the cell just played, so each cell keeps the K-long
+# window masks on those lines and a win check is at most 4 * K mask tests.
+# Ties come from the move counter.
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+# Index of each player's bits in a board
+SIDE = {'X': 0, 'O': 1}
+
+
+class Rules:
+    def __init__(self, size, win_length):
+        self.size = size
+        self.win_length = win_length
+        self.cells = size * size
+        self.cell_windows = tuple(self._windows_through(i) for i in range(self.cells))
+        self.window_cells = {}
+        for windows in self.cell_windows:
+            for m in windows:
+                if m not in self.window_cells:
+                    self.window_cells[m] = [divmod(i, size) for i in range(self.cells) if m >> i & 1]
+
+    def _windows_through(self, cell):
+        size, k = self.size, self.win_length
+        row, col = divmod(cell, size)
+        windows = []
+        for dr, dc in DIRECTIONS:
+            # Every K-long window on this line that contains the cell
+            for back in range(k):
+                r0, c0 = row - dr * back, col - dc * back
+                r1, c1 = r0 + dr * (k - 1), c0 + dc * (k - 1)
+                if not (0 <= r0 < size and 0 <= c0 < size and 0 <= r1 < size and 0 <= c1 < size):
+                    continue
+                m = 0
+                for step in range(k):
+                    m |= 1 << ((r0 + dr * step) * size + c0 + dc * step)
+                windows.append(m)
+        return tuple(windows)
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.size and 0 <= col < self.size
+
+    def cell_index(self, row, col):
+        return row * self.size + col
+
+    def play(self, bits, player, cell, move_count):
+        # Set the cell for player; move_count includes this move.
+        # Returns (winner, winning_cells) like the old check_winner.
+        side = SIDE[player]
+        own = bits[side] | (1 << cell)
+        bits[side] = own
+        for m in self.cell_windows[cell]:
+            if own & m == m:
+                return player, self.window_cells[m]
+        if move_count >= self.cells:
+            return 'Tie', []
+        return None, []
+
+    def winner_of(self, bits):
+        # Full evaluation of a position, for callers that do not know the last move
+        for player, own in zip(('X', 'O'), bits):
+            for windows in self.cell_windows:
+                for m in windows:
+                    if own & m == m:
+                        return player, self.window_cells[m]
+        if (bits[0] | bits[1]).bit_count() == self.cells:
+            return 'Tie', []
+        return None, []
+
+    def to_bytes(self, bits):
+        # One byte per cell (0 empty, 1 X, 2 O) for binary clients
+        x, o = bits
+        return bytes(1 if x >> i & 1 else 2 if o >> i & 1 else 0 for i in range(self.cells))
+
+    def to_rows(self, bits):
+        # Render as the list-of-lists board the client draws
+        (x, o), size = bits, self.size
+        return [
+            ['X' if x >> i & 1 else 'O' if o >> i & 1 else ' '
+             for i in range(r * size, r * size + size)]
+            for r in range(size)
+        ]
+
+
+STANDARD = Rules(3, 3)
+
+# game_mode -> rules; anything not listed plays on the standard board
+MODES = {
+    'standard': STANDARD,
+    'timed': STANDARD,
+    'blitz': STANDARD,
+    'connect4': Rules(7, 4),
+    'gomoku': Rules(15, 5),
+}
+
+
+def rules_for(game_mode):
+    return MODES.get(game_mode, STANDARD)
+
+
+def new_bits():
+    return [0, 0]
+
+
+def is_taken(bits, cell):
+    return (bits[0] | bits[1]) >> cell & 1
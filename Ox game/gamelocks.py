@@ -0,0 +1,63 @@
+# One lock per game, so each game handles its events one at a time.
+#
+# A move is read-validate-write over the board, the turn, the scores and
+# the player stats; two handlers interleaving on the same game can both
+# pass validation and play twice, or emit deltas out of seq order. Every
+# handler that changes a game holds that game's lock from loading it until
+# its broadcasts are sent. Locks are per game_id, so unrelated games never
+# wait on each other.
+#
+# The lock type has to match how handlers run: green threads need the
+# hub's semaphore (a threading.Lock would block the whole hub), OS threads
+# need threading.Lock.
+
+import threading
+
+
+def lock_factory(async_mode):
+    if async_mode == 'eventlet':
+        from eventlet.semaphore import Semaphore
+        return Semaphore
+    if async_mode == 'gevent':
+        from gevent.lock import Semaphore
+        return Semaphore
+    return threading.Lock
+
+
+class GameLocks:
+    def __init__(self, factory):
+        self.factory = factory
+        self._locks = {}
+        self.acquired = 0
+        self.contended = 0
+
+    def __call__(self, game_id):
+        lock = self._locks.get(game_id)
+        if lock is None:
+            # setdefault keeps a single lock per game if two callers get here together
+            lock = self._locks.setdefault(game_id, self.factory())
+        return _Held(self, lock)
+
+    def discard(self, game_id):
+        self._locks.pop(game_id, None)
+
+    def stats(self):
+        return {'games': len(self._locks), 'acquired': self.acquired, 'contended': self.contended}
+
+
+class _Held:
+    __slots__ = ('locks', 'lock')
+
+    def __init__(self, locks, lock):
+        self.locks = locks
+        self.lock = lock
+
+    def __enter__(self):
+        if not self.lock.acquire(blocking=False):
+            self.locks.contended += 1
+            self.lock.acquire()
+        self.locks.acquired += 1
+        return self.lock
+
+    def __exit__(self, *exc):
+        self.lock.release()
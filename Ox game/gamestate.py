@@ -0,0 +1,173 @@
+# Compact per-game state.
+#
+# One slotted object per game instead of a 15-key dict. The board is the
+# engine's [x_bits, o_bits] pair, seats are a 2-bit mask, and each move is
+# one 32-bit word in an array: cell index in the low 8 bits, the player in
+# bit 8 and milliseconds since the round started in the top 23 bits.
+#
+# `seq` increases on every change clients can see (moves, resets, seats and
+# names), so a client holding seq n knows it has missed nothing if the next
+# update it receives is n + 1. It is also the version the encoded snapshot
+# cache (one entry per wire format) is keyed on.
+#
+# to_state()/load_state() convert the shared part of a game to plain
+# JSON-able values for the durable stores; the search handle and snapshot
+# cache belong to the process that holds the object and are never stored.
+#
+# `last_active` is when the game was last saved; the app evicts games that
+# stay idle for too long (see _start_expiry_sweeper in app.py).
+
+import time
+from array import array
+
+import engine
+
+CELL_BITS = 8
+PLAYER_BIT = 1 << CELL_BITS
+DELTA_SHIFT = CELL_BITS + 1
+MAX_DELTA_MS = (1 << (32 - DELTA_SHIFT)) - 1
+
+PLAYERS = ('X', 'O')
+SEAT = {'X': 1, 'O': 2}
+
+# Stored as-is by to_state(); bits, moves and rules are converted
+STATE_FIELDS = (
+    'game_id', 'game_mode', 'theme', 'move_count', 'current_player', 'winner',
+    'winning_cells', 'seats', 'names', 'scores', 'game_start_time',
+    'round_start_time', 'last_move_time', 'time_controls', 'computer', 'seq',
+)
+
+
+class Game:
+    __slots__ = (
+        'game_id', 'game_mode', 'rules', 'theme', 'bits', 'move_count', 'moves',
+        'current_player', 'winner', 'winning_cells', 'seats', 'names', 'scores',
+        'game_start_time', 'round_start_time', 'last_move_time',
+        'time_controls', 'computer', 'search', 'seq', 'snapshots', 'snapshot_seq',
+        'last_active',
+    )
+
+    def __init__(self, game_id, game_mode='standard', theme='classic', time_controls=None,
+                 computer=None):
+        now = time.time()
+        self.game_id = game_id
+        self.game_mode = game_mode
+        self.rules = engine.rules_for(game_mode)
+        self.theme = theme
+        self.seats = 0
+        self.names = [None, None]
+        self.scores = [0, 0]
+        self.game_start_time = now
+        self.last_active = now
+        self.time_controls = time_controls
+        self.computer = computer
+        self.search = None
+        self.moves = array('I')
+        self.seq = 0
+        self.snapshots = {}
+        self.snapshot_seq = -1
+        self.reset(now)
+
+    def reset(self, now=None):
+        now = time.time() if now is None else now
+        self.bits = engine.new_bits()
+        self.move_count = 0
+        del self.moves[:]
+        self.current_player = 'X'
+        self.winner = None
+        self.winning_cells = []
+        self.round_start_time = now
+        self.last_move_time = now
+        if self.time_controls:
+            # Each round starts with a full clock for both sides
+            self.time_controls['remaining'] = {p: self.time_controls['per_move'] for p in PLAYERS}
+        self.seq += 1
+
+    @property
+    def players(self):
+        return [p for p in PLAYERS if self.seats & SEAT[p]]
+
+    def seat(self, player, name=None):
+        self.seats |= SEAT[player]
+        if name is not None:
+            self.names[engine.SIDE[player]] = name
+        self.seq += 1
+
+    def unseat(self, player):
+        self.seats &= ~SEAT[player]
+        self.seq += 1
+
+    def is_seated(self, player):
+        return bool(self.seats & SEAT.get(player, 0))
+
+    def name_of(self, player):
+        name = self.names[engine.SIDE[player]]
+        return name if name is not None else f'Player {player}'
+
+    def set_name(self, player, name):
+        if self.names[engine.SIDE[player]] != name:
+            self.names[engine.SIDE[player]] = name
+            self.seq += 1
+
+    @property
+    def player_names(self):
+        return {p: n for p, n in zip(PLAYERS, self.names) if n is not None}
+
+    def add_score(self, player):
+        self.scores[engine.SIDE[player]] += 1
+
+    def time_out(self):
+        # The side to move ran out of time; the other side wins the round
+        loser = self.current_player
+        self.time_controls['remaining'][loser] = 0
+        self.winner = 'O' if loser == 'X' else 'X'
+        self.winning_cells = []
+        self.add_score(self.winner)
+        self.seq += 1
+        return loser
+
+    def record_move(self, player, cell, now):
+        delta = min(int((now - self.round_start_time) * 1000), MAX_DELTA_MS)
+        word = cell | (PLAYER_BIT if player == 'O' else 0) | delta << DELTA_SHIFT
+        self.moves.append(word)
+        self.seq += 1
+
+    def history(self):
+        # Unpacks the move words into the dicts clients and templates expect
+        size = self.rules.size
+        out = []
+        for word in self.moves:
+            r, c = divmod(word & (PLAYER_BIT - 1), size)
+            out.append({
+                'player': 'O' if word & PLAYER_BIT else 'X',
+                'row': r,
+                'col': c,
+                'timestamp': self.round_start_time + (word >> DELTA_SHIFT) / 1000
+            })
+        return out
+
+    def to_state(self):
+        state = {name: getattr(self, name) for name in STATE_FIELDS}
+        state['bits'] = list(self.bits)
+        state['moves'] = self.moves.tolist()
+        state['last_active'] = self.last_active
+        return state
+
+    def load_state(self, state):
+        # Refreshes the shared fields in place, keeping this process's search and snapshots
+        for name in STATE_FIELDS:
+            setattr(self, name, state[name])
+        self.rules = engine.rules_for(self.game_mode)
+        self.bits = list(state['bits'])
+        self.moves = array('I', state['moves'])
+        # Games stored before last_active existed count from their last move
+        self.last_active = state.get('last_active', self.last_move_time)
+        return self
+
+    @classmethod
+    def from_state(cls, state):
+        game = cls.__new__(cls)
+        game.search = None
+        game.snapshots = {}
+        game.snapshot_seq = -1
+        return game.load_state(state)
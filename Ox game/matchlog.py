@@ -0,0 +1,133 @@
+# Finished rounds, written behind to the `match` table of ox_app.db.
+#
+# The move that ends a round only puts a tuple on an in-memory queue; one OS
+# thread takes everything queued so far and writes it as a single
+# transaction, so the move path never waits on the disk and a burst of
+# finished games costs one commit. The database is in WAL mode, so readers
+# (and other workers' writers) are not blocked while a batch commits.
+#
+# `match` has one row per game (game_id is unique): a game's later rounds
+# replace its row, which holds the last finished round's winner, its moves as
+# the JSON of Game.history(), the players as JSON {'X': name, 'O': name} and
+# created_at, when the round started. Games have no visibility or
+# password, so every row is public with no password.
+#
+# stats() reports the queue depth and how long the batches took to commit.
+# Rows still queued at exit are flushed by close().
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS "match" (
+    id INTEGER NOT NULL,
+    game_id VARCHAR(8),
+    created_at DATETIME,
+    winner VARCHAR(8),
+    moves TEXT,
+    players TEXT,
+    public BOOLEAN,
+    password VARCHAR(64),
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_match_game_id ON "match" (game_id);
+'''
+
+UPSERT = '''
+INSERT INTO "match" (game_id, created_at, winner, moves, players, public, password)
+VALUES (?, ?, ?, ?, ?, 1, NULL)
+ON CONFLICT (game_id) DO UPDATE SET created_at = excluded.created_at, winner = excluded.winner,
+    moves = excluded.moves, players = excluded.players
+'''
+
+# Rows per transaction at most; a longer queue is written in several
+BATCH_LIMIT = 500
+
+
+class MatchLog:
+    def __init__(self, path, batch_limit=BATCH_LIMIT):
+        self.path = path
+        self.batch_limit = batch_limit
+        self.queue = queue.SimpleQueue()
+        self.writer = None
+        self.start_lock = threading.Lock()
+        self.queued = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.flush_total = 0.0
+        self.flush_last = 0.0
+        self.flush_max = 0.0
+
+    def record(self, game):
+        # Called under the game's lock when a round ends; copies what the row needs
+        self.queue.put((game.game_id, game.round_start_time, game.winner, game.history(), game.player_names))
+        self.queued += 1
+        if self.writer is None:
+            self._start()
+
+    def _start(self):
+        with self.start_lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write, name='matchlog', daemon=True)
+                self.writer.start()
+
+    def _write(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_limit:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = None in batch
+            rows = [_row(*entry) for entry in batch if entry is not None]
+            if rows:
+                start = time.perf_counter()
+                try:
+                    with conn:
+                        conn.executemany(UPSERT, rows)
+                    self.written += len(rows)
+                except sqlite3.Error:
+                    self.failed += len(rows)
+                elapsed = time.perf_counter() - start
+                self.batches += 1
+                self.flush_total += elapsed
+                self.flush_last = elapsed
+                self.flush_max = max(self.flush_max, elapsed)
+            if closing:
+                conn.close()
+                return
+
+    def close(self):
+        # Writes out whatever is still queued and stops the writer
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'queued': self.queued,
+            'written': self.written,
+            'failed': self.failed,
+            'batches': self.batches,
+            'flush_ms_last': self.flush_last * 1000,
+            'flush_ms_max': self.flush_max * 1000,
+            'flush_ms_avg': self.flush_total / self.batches * 1000 if self.batches else 0.0,
+        }
+
+
+def _row(game_id, started, winner, moves, players):
+    created_at = datetime.fromtimestamp(started, timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+    return (game_id, created_at, winner, json.dumps(moves, separators=(',', ':')),
+            json.dumps(players, separators=(',', ':')))
@@ -0,0 +1,202 @@
+# Rating-aware matchmaking for the random-opponent flow.
+#
+# Waiting players sit in one queue per (game_mode, theme). Each queue keeps
+# its tickets in a list sorted by (rating, serial), so the nearest-rated
+# opponent of a newcomer is found with one bisect and a look at the two
+# neighbours. A ticket accepts opponents within a window that starts at
+# BASE_WINDOW Elo and widens by WIDEN_PER_SEC for every second it waits;
+# a pairing goes ahead when either side's window covers the gap. sweep()
+# re-checks neighbouring waiters as their windows grow, and drops tickets
+# nobody claimed within TICKET_TTL.
+#
+# Finding a neighbour is O(log n), but entering or leaving a queue is
+# O(n): insort and del shift the rest of the list along (one memmove of
+# pointers). A queue only holds players currently waiting for that mode and
+# theme, and at those sizes the shift is cheaper than keeping a tree.
+#
+# Nothing here yields or locks: on green threads no two calls interleave,
+# and with OS threads (OX_ASYNC_MODE=threading) the app holds one lock
+# around each pairing, so two /random requests never take the same waiter.
+
+import bisect
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_RATING = 1200
+BASE_WINDOW = 50
+WIDEN_PER_SEC = 50
+MAX_WINDOW = 800
+TICKET_TTL = 600
+# Width of the rating buckets reported in stats()
+BUCKET_WIDTH = 100
+
+
+class Ticket:
+    __slots__ = ('token', 'name', 'rating', 'queue', 'joined_at', 'key', 'game_id', 'seat',
+                 'opponent', 'matched_at')
+
+    def __init__(self, token, name, rating, queue, joined_at):
+        self.token = token
+        self.name = name
+        self.rating = rating
+        self.queue = queue
+        self.joined_at = joined_at
+        self.key = None
+        self.game_id = None
+        self.seat = None
+        self.opponent = None
+        self.matched_at = None
+
+    @property
+    def matched(self):
+        return self.seat is not None
+
+    def window(self, now):
+        return min(MAX_WINDOW, BASE_WINDOW + WIDEN_PER_SEC * (now - self.joined_at))
+
+
+class Matchmaker:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        # queue -> sorted [(rating, serial)], and (rating, serial) -> Ticket
+        self._keys = {}
+        self._waiting = {}
+        # token -> Ticket, waiting or matched but not yet claimed
+        self.tickets = {}
+        self._serial = 0
+        self.joins = 0
+        self.matches = 0
+        self.expired = 0
+
+    def _acceptable(self, a, b, now):
+        return abs(a.rating - b.rating) <= max(a.window(now), b.window(now))
+
+    def _remove(self, ticket):
+        keys = self._keys[ticket.queue]
+        del keys[bisect.bisect_left(keys, ticket.key)]
+        del self._waiting[ticket.key]
+        if not keys:
+            del self._keys[ticket.queue]
+
+    def _pair(self, waiting, newcomer, now):
+        # The player who waited takes X
+        waiting.seat, newcomer.seat = 'X', 'O'
+        waiting.opponent, newcomer.opponent = newcomer.name, waiting.name
+        waiting.matched_at = newcomer.matched_at = now
+        self.matches += 1
+        return waiting, newcomer
+
+    def join(self, token, name, rating, queue):
+        # Returns the waiting Ticket paired with this one, or None if it now waits
+        now = self.clock()
+        self.joins += 1
+        old = self.tickets.get(token)
+        if old is not None and not old.matched:
+            self._remove(old)
+        ticket = Ticket(token, name, rating, queue, now)
+        self.tickets[token] = ticket
+
+        keys = self._keys.get(queue)
+        if keys:
+            i = bisect.bisect_left(keys, (rating,))
+            best = None
+            for j in (i - 1, i):
+                if 0 <= j < len(keys):
+                    other = self._waiting[keys[j]]
+                    if self._acceptable(other, ticket, now) and (
+                            best is None or abs(other.rating - rating) < abs(best.rating - rating)):
+                        best = other
+            if best is not None:
+                self._remove(best)
+                self._pair(best, ticket, now)
+                return best
+
+        self._serial += 1
+        ticket.key = (rating, self._serial)
+        if keys is None:
+            keys = self._keys[queue] = []
+        bisect.insort(keys, ticket.key)
+        self._waiting[ticket.key] = ticket
+        return None
+
+    def cancel(self, token):
+        ticket = self.tickets.pop(token, None)
+        if ticket is not None and not ticket.matched:
+            self._remove(ticket)
+        return ticket
+
+    def claim(self, token):
+        # Hands a matched ticket to its owner exactly once
+        ticket = self.tickets.get(token)
+        if ticket is None or not ticket.matched:
+            return None
+        del self.tickets[token]
+        return ticket
+
+    def sweep(self):
+        # Pairs neighbours whose windows have grown to overlap and expires
+        # abandoned tickets; returns the new (waiting, waiting) pairs
+        now = self.clock()
+        pairs = []
+        for queue in list(self._keys):
+            keys = self._keys[queue]
+            i = 0
+            while i + 1 < len(keys):
+                a, b = self._waiting[keys[i]], self._waiting[keys[i + 1]]
+                if self._acceptable(a, b, now):
+                    first, second = (a, b) if a.joined_at <= b.joined_at else (b, a)
+                    self._remove(a)
+                    self._remove(b)
+                    pairs.append(self._pair(first, second, now))
+                    if queue not in self._keys:
+                        break
+                else:
+                    i += 1
+        for token, ticket in list(self.tickets.items()):
+            since = ticket.matched_at if ticket.matched else ticket.joined_at
+            if now - since > TICKET_TTL:
+                self.cancel(token)
+                self.expired += 1
+        return pairs
+
+    def stats(self):
+        buckets = {}
+        for ticket in self._waiting.values():
+            bucket = ticket.rating // BUCKET_WIDTH * BUCKET_WIDTH
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        return {
+            'waiting': len(self._waiting),
+            'unclaimed': len(self.tickets) - len(self._waiting),
+            'queues': {'/'.join(queue): len(keys) for queue, keys in self._keys.items()},
+            'rating_buckets': dict(sorted(buckets.items())),
+            'joins': self.joins,
+            'matches': self.matches,
+            'expired': self.expired,
+        }
+
+
+class Ratings:
+    # Elo lookups against the player table; unknown names get DEFAULT_RATING.
+    # One connection, opened by the first lookup that finds the file and
+    # shared by every request. A lookup never yields, so a threading.Lock
+    # is safe on green threads too
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def rating_of(self, name):
+        if not name:
+            return DEFAULT_RATING
+        with self.lock:
+            if self.conn is None:
+                if not os.path.exists(self.path):
+                    return DEFAULT_RATING
+                self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            try:
+                row = self.conn.execute('SELECT elo FROM player WHERE name = ?', (name,)).fetchone()
+            except sqlite3.Error:
+                return DEFAULT_RATING
+        return row[0] if row and row[0] is not None else DEFAULT_RATING
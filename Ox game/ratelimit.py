@@ -0,0 +1,79 @@
+# Token buckets for socket events, per sid and per room (game).
+#
+# Every limited event has its own buckets: one per sid, and optionally one
+# per game_id shared by everyone in that game. A bucket holds up to `burst`
+# tokens and refills at `rate` tokens a second; an event spends one token
+# from its sid's bucket and one from its room's and is dropped if either is
+# empty. A bucket is a single float in a dict (see EventLimit), so there is
+# no timer and an accepted event costs a dict get and set per bucket and a
+# few comparisons. Dropped events get no reply, only a counter.
+#
+# Limits are {event: {'sid': [rate, burst], 'room': [rate, burst]}}; 'room'
+# is optional and events without an entry are never limited.
+
+import time
+
+
+class EventLimit:
+    # Each bucket is kept as one float: the time at which it would be full
+    # again were nothing else spent (the token bucket's "virtual scheduling"
+    # form). Spending a token pushes that time 1/rate later, and is refused
+    # when it would push it more than burst/rate ahead of now
+    __slots__ = ('sid_interval', 'sid_window', 'room_interval', 'room_window', 'sids', 'rooms',
+                 'dropped_sid', 'dropped_room')
+
+    def __init__(self, sid, room=None):
+        self.sid_interval, self.sid_window = _bucket(*sid)
+        self.room_interval, self.room_window = _bucket(*room) if room else (None, None)
+        self.sids = {}
+        self.rooms = {}
+        self.dropped_sid = 0
+        self.dropped_room = 0
+
+    def allow(self, sid, room, now):
+        full = self.sids.get(sid, now)
+        if full < now:
+            full = now
+        if full - now > self.sid_window:
+            self.dropped_sid += 1
+            return False
+        if self.room_interval is not None and room is not None:
+            shared = self.rooms.get(room, now)
+            if shared < now:
+                shared = now
+            if shared - now > self.room_window:
+                self.dropped_room += 1
+                return False
+            self.rooms[room] = shared + self.room_interval
+        self.sids[sid] = full + self.sid_interval
+        return True
+
+    def stats(self):
+        return {'dropped_sid': self.dropped_sid, 'dropped_room': self.dropped_room,
+                'sids': len(self.sids), 'rooms': len(self.rooms)}
+
+
+def _bucket(rate, burst):
+    # A bucket is empty once `burst` tokens are spent ahead of its refill
+    return 1 / rate, (burst - 1) / rate
+
+
+class RateLimiter:
+    def __init__(self, limits, clock=time.monotonic):
+        self.clock = clock
+        self.limits = {event: EventLimit(spec['sid'], spec.get('room')) for event, spec in limits.items()}
+
+    def allow(self, event, sid, room=None):
+        limit = self.limits.get(event)
+        return limit is None or limit.allow(sid, room, self.clock())
+
+    def forget_sid(self, sid):
+        for limit in self.limits.values():
+            limit.sids.pop(sid, None)
+
+    def forget_room(self, room):
+        for limit in self.limits.values():
+            limit.rooms.pop(room, None)
+
+    def stats(self):
+        return {event: limit.stats() for event, limit in self.limits.items()}
@@ -0,0 +1,52 @@
+# Recent game_deltas per game, for clients resuming after a dropped socket.
+#
+# A client that reconnects says which seq it last applied. If every delta
+# since then is still here it gets just those, in order, as one event;
+# otherwise (too far behind, or a change with no delta such as a seat or a
+# name) it gets the full snapshot as before. Each game keeps the last
+# `capacity` deltas in a fixed list indexed by seq % capacity, so recording
+# one overwrites the oldest and checking a gap is one lookup per missed seq.
+#
+# Logs live in the process that broadcast the deltas, which is the one its
+# clients reconnect to (games are sticky to a worker, see cluster.py).
+
+REPLAY_LIMIT = 64
+
+
+class Replays:
+    def __init__(self, capacity=REPLAY_LIMIT):
+        self.capacity = capacity
+        self.logs = {}
+        self.replayed = 0
+        self.fallbacks = 0
+
+    def record(self, game_id, seq, delta):
+        log = self.logs.get(game_id)
+        if log is None:
+            log = self.logs[game_id] = [None] * self.capacity
+        log[seq % self.capacity] = (seq, delta)
+
+    def since(self, game_id, seq, current):
+        # The deltas after seq up to current, or None when any of them is gone
+        if seq == current:
+            return []
+        log = self.logs.get(game_id)
+        if log is None or not 0 <= current - seq <= self.capacity:
+            self.fallbacks += 1
+            return None
+        missed = []
+        for n in range(seq + 1, current + 1):
+            entry = log[n % self.capacity]
+            if entry is None or entry[0] != n:
+                self.fallbacks += 1
+                return None
+            missed.append(entry[1])
+        self.replayed += 1
+        return missed
+
+    def discard(self, game_id):
+        self.logs.pop(game_id, None)
+
+    def stats(self):
+        return {'games': len(self.logs), 'capacity': self.capacity,
+                'replayed': self.replayed, 'fallbacks': self.fallbacks}
@@ -0,0 +1,217 @@
+# Time-budgeted computer opponent for boards bigger than 3x3.
+#
+# Searches run in a process pool so the server's green or OS threads never
+# do the CPU work. Each search is iterative-deepening negamax with alpha-beta and a
+# transposition table, over moves next to existing stones, and returns the
+# best move of the deepest iteration finished before the deadline.
+#
+# Cancellation goes through a shared-memory array: every in-flight search
+# owns a slot holding its generation number, and the worker aborts as soon
+# as the slot no longer matches.
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+
+# Seconds of search per computer move
+BUDGET = {'easy': 0.1, 'medium': 0.4, 'hard': 1.2}
+
+WIN = 1 << 40
+MAX_DEPTH = 32
+EXACT, LOWER, UPPER = 0, 1, 2
+
+_flags = None
+_rules = {}
+
+
+def _init_worker(flags):
+    global _flags
+    _flags = flags
+
+
+class _Abort(Exception):
+    pass
+
+
+class _Search:
+    def __init__(self, rules, deadline, slot, generation):
+        self.rules = rules
+        self.size = rules.size
+        self.full = (1 << rules.cells) - 1
+        self.windows = tuple(rules.window_cells)
+        # 4**count per stone in an otherwise open window
+        self.weights = tuple(4 ** n for n in range(rules.win_length + 1))
+        not_first, not_last = self.full, self.full
+        for r in range(self.size):
+            not_first &= ~(1 << (r * self.size))
+            not_last &= ~(1 << (r * self.size + self.size - 1))
+        self.not_first, self.not_last = not_first, not_last
+        self.deadline = deadline
+        self.slot = slot
+        self.generation = generation
+        self.tt = {}
+        self.nodes = 0
+
+    def check(self):
+        self.nodes += 1
+        if self.nodes & 127 == 0:
+            if time.monotonic() >= self.deadline:
+                raise _Abort
+            if _flags is not None and _flags[self.slot] != self.generation:
+                raise _Abort
+
+    def wins(self, own, cell):
+        for m in self.rules.cell_windows[cell]:
+            if own & m == m:
+                return True
+        return False
+
+    def evaluate(self, own, opp):
+        weights = self.weights
+        score = 0
+        for m in self.windows:
+            a = own & m
+            b = opp & m
+            if a and not b:
+                score += weights[a.bit_count()]
+            elif b and not a:
+                score -= weights[b.bit_count()]
+        return score
+
+    def candidates(self, own, opp):
+        filled = own | opp
+        if not filled:
+            return [self.rules.cells // 2]
+        # Empty cells within one step of any stone
+        h = filled | (filled << 1 & self.not_first) | (filled >> 1 & self.not_last)
+        near = (h | h << self.size | h >> self.size) & self.full & ~filled
+        cells = []
+        while near:
+            low = near & -near
+            cells.append(low.bit_length() - 1)
+            near ^= low
+        return cells
+
+    def negamax(self, own, opp, depth, alpha, beta, ply):
+        self.check()
+        key = (own, opp)
+        entry = self.tt.get(key)
+        best_cell = None
+        if entry is not None:
+            e_depth, e_flag, e_score, best_cell = entry
+            if e_depth >= depth:
+                if e_flag == EXACT:
+                    return e_score
+                if e_flag == LOWER and e_score >= beta:
+                    return e_score
+                if e_flag == UPPER and e_score <= alpha:
+                    return e_score
+        if depth == 0:
+            return self.evaluate(own, opp)
+
+        moves = self.candidates(own, opp)
+        if not moves:
+            return 0
+        if best_cell in moves:
+            moves.remove(best_cell)
+            moves.insert(0, best_cell)
+
+        alpha0 = alpha
+        best, best_move = -WIN * 2, moves[0]
+        filled = (own | opp).bit_count() + 1
+        for cell in moves:
+            nown = own | 1 << cell
+            if self.wins(nown, cell):
+                score = WIN - ply
+            elif filled == self.rules.cells:
+                score = 0
+            else:
+                score = -self.negamax(opp, nown, depth - 1, -beta, -alpha, ply + 1)
+            if score > best:
+                best, best_move = score, cell
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        flag = EXACT
+        if best <= alpha0:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        self.tt[key] = (depth, flag, best, best_move)
+        return best
+
+    def root(self, own, opp):
+        moves = self.candidates(own, opp)
+        # Immediate win, then forced block, before spending any budget
+        for cell in moves:
+            if self.wins(own | 1 << cell, cell):
+                return cell
+        for cell in moves:
+            if self.wins(opp | 1 << cell, cell):
+                return cell
+        best_move = moves[0]
+        for depth in range(1, MAX_DEPTH + 1):
+            try:
+                self.negamax(own, opp, depth, -WIN * 2, WIN * 2, 0)
+            except _Abort:
+                break
+            best_move = self.tt[(own, opp)][3]
+        return best_move
+
+
+def search_move(size, win_length, x, o, player, budget, slot=0, generation=0):
+    # Entry point run in the pool; returns the cell to play
+    rules = _rules.get((size, win_length))
+    if rules is None:
+        rules = _rules[(size, win_length)] = engine.Rules(size, win_length)
+    own, opp = (x, o) if player == 'X' else (o, x)
+    search = _Search(rules, time.monotonic() + budget, slot, generation)
+    return search.root(own, opp)
+
+
+class SearchTask:
+    def __init__(self, future, slot, generation):
+        self.future = future
+        self.slot = slot
+        self.generation = generation
+
+
+class SearchPool:
+    def __init__(self, workers=None, slots=256):
+        self._workers = workers
+        self._flags = multiprocessing.Array('q', slots, lock=False)
+        self._free = list(range(slots))
+        self._generation = 0
+        self._executor = None
+
+    def _pool(self):
+        # Started lazily so servers without computer games never fork workers
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers, initializer=_init_worker, initargs=(self._flags,))
+        return self._executor
+
+    def submit(self, rules, bits, player, budget):
+        if not self._free:
+            return None
+        slot = self._free.pop()
+        self._generation += 1
+        self._flags[slot] = self._generation
+        future = self._pool().submit(
+            search_move, rules.size, rules.win_length, bits[0], bits[1],
+            player, budget, slot, self._generation)
+        return SearchTask(future, slot, self._generation)
+
+    def cancel(self, task):
+        # Drops a queued search, and makes a running one abort at its next check
+        task.future.cancel()
+        if self._flags[task.slot] == task.generation:
+            self._flags[task.slot] = 0
+
+    def release(self, task):
+        self._flags[task.slot] = 0
+        self._free.append(task.slot)
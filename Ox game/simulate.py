@@ -0,0 +1,195 @@
+# Headless batch simulator for bot evaluation and mode balancing.
+#
+# A batch is an int8 array of boards, one row per game (0 empty, 1 X, 2 O).
+# Every step asks the side to move for one cell per unfinished game and
+# checks all of them at once against the K-long windows through the cell
+# just played, the same windows engine.Rules uses for live games.
+#
+# A policy is any callable policy(boards, legal, player, rng) -> cells where
+# boards is (n, cells) int8, legal is the matching bool mask of empty cells,
+# player is 1 or 2 and cells is an (n,) int array of chosen moves.
+#
+#   python simulate.py --mode standard --games 1000000 --x random --o greedy
+
+import argparse
+import time
+
+import numpy as np
+
+import engine
+
+X, O, TIE = 1, 2, 3
+OUTCOME = {X: 'X', O: 'O', TIE: 'Tie'}
+
+
+class Tables:
+    # Rules re-expressed as index arrays; column `cells` is a padding cell
+    # that is always empty, so padded windows can never be complete.
+    def __init__(self, rules):
+        self.rules = rules
+        self.cells = rules.cells
+        self.k = rules.win_length
+        masks = list(rules.window_cells)
+        index = {m: i for i, m in enumerate(masks)}
+        self.windows = np.array(
+            [[r * rules.size + c for r, c in rules.window_cells[m]] for m in masks] +
+            [[self.cells] * self.k], dtype=np.intp)
+        widest = max(len(w) for w in rules.cell_windows)
+        self.cell_windows = np.full((self.cells, widest), len(masks), dtype=np.intp)
+        for cell, ws in enumerate(rules.cell_windows):
+            self.cell_windows[cell, :len(ws)] = [index[m] for m in ws]
+        # Window/cell membership, for policies that score every window
+        self.membership = np.zeros((len(masks), self.cells), dtype=np.float32)
+        for i, m in enumerate(masks):
+            self.membership[i, self.windows[i]] = 1
+
+
+_tables = {}
+
+
+def tables_for(rules):
+    key = (rules.size, rules.win_length)
+    if key not in _tables:
+        _tables[key] = Tables(rules)
+    return _tables[key]
+
+
+def random_policy(boards, legal, player, rng):
+    scores = rng.random(legal.shape, dtype=np.float32)
+    scores[~legal] = -1
+    return scores.argmax(1)
+
+
+def make_greedy_policy(rules):
+    # Win if possible, else block an immediate loss, else play randomly
+    t = tables_for(rules)
+    windows = t.windows[:-1]
+
+    def greedy_policy(boards, legal, player, rng):
+        lines = boards[:, windows]
+        own = (lines == player).sum(2)
+        opp = (lines == 3 - player).sum(2)
+        win = ((own == t.k - 1) & (opp == 0)).astype(np.float32) @ t.membership
+        block = ((opp == t.k - 1) & (own == 0)).astype(np.float32) @ t.membership
+        scores = rng.random(legal.shape) + 2 * (block > 0) + 4 * (win > 0)
+        scores[~legal] = -1
+        return scores.argmax(1)
+
+    return greedy_policy
+
+
+POLICIES = {
+    'random': lambda rules: random_policy,
+    'greedy': make_greedy_policy,
+}
+
+
+def run_batch(rules, n, x_policy, o_policy, rng):
+    # Plays n games to completion; returns (results, moves, counts)
+    t = tables_for(rules)
+    cells = t.cells
+    width = cells + 1
+    boards = np.zeros((n, width), dtype=np.int8)
+    flat = boards.reshape(-1)
+    moves = np.zeros((n, cells), dtype=np.int16)
+    counts = np.zeros(n, dtype=np.int16)
+    results = np.zeros(n, dtype=np.int8)
+    active = np.arange(n)
+    player = X
+    for ply in range(cells):
+        if not active.size:
+            break
+        sub = boards[active, :cells]
+        legal = sub == 0
+        policy = x_policy if player == X else o_policy
+        chosen = np.asarray(policy(sub, legal, player, rng), dtype=np.intp)
+        if not legal[np.arange(active.size), chosen].all():
+            raise ValueError('policy chose an occupied cell')
+        base = active * width
+        flat[base + chosen] = player
+        moves[active, ply] = chosen
+        counts[active] = ply + 1
+
+        # All windows through each game's last move, checked in one gather
+        lines = t.windows[t.cell_windows[chosen]] + base[:, None, None]
+        won = (flat.take(lines) == player).all(2).any(1)
+        results[active[won]] = player
+        if ply + 1 == cells:
+            results[active[~won]] = TIE
+        active = active[~won]
+        player = O if player == X else X
+    return results, moves, counts
+
+
+def simulate(game_mode='standard', games=100000, x_policy='random', o_policy='random',
+             batch=65536, seed=None):
+    rules = engine.rules_for(game_mode)
+    rng = np.random.default_rng(seed)
+    if isinstance(x_policy, str):
+        x_policy = POLICIES[x_policy](rules)
+    if isinstance(o_policy, str):
+        o_policy = POLICIES[o_policy](rules)
+    totals = {'X': 0, 'O': 0, 'Tie': 0}
+    plies = 0
+    start = time.perf_counter()
+    done = 0
+    while done < games:
+        n = min(batch, games - done)
+        results, _, counts = run_batch(rules, n, x_policy, o_policy, rng)
+        for code, name in OUTCOME.items():
+            totals[name] += int((results == code).sum())
+        plies += int(counts.sum())
+        done += n
+    elapsed = time.perf_counter() - start
+    return {
+        'games': games,
+        'results': totals,
+        'avg_moves': plies / games,
+        'seconds': elapsed,
+        'games_per_sec': games / elapsed if elapsed else float('inf'),
+    }
+
+
+def verify(game_mode='standard', games=2000, seed=0):
+    # Replays simulated games through engine.Rules.play and compares outcomes
+    rules = engine.rules_for(game_mode)
+    rng = np.random.default_rng(seed)
+    results, moves, counts = run_batch(rules, games, random_policy,
+                                       make_greedy_policy(rules), rng)
+    for g in range(games):
+        bits = engine.new_bits()
+        player, winner = 'X', None
+        for n in range(int(counts[g])):
+            winner, _ = rules.play(bits, player, int(moves[g, n]), n + 1)
+            if winner:
+                break
+            player = 'O' if player == 'X' else 'X'
+        if winner != OUTCOME[int(results[g])] or n + 1 != counts[g]:
+            raise AssertionError(f'game {g} differs from live rules: {winner} vs {OUTCOME[int(results[g])]}')
+    return games
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless batch game simulator')
+    parser.add_argument('--mode', default='standard', choices=sorted(engine.MODES))
+    parser.add_argument('--games', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=65536)
+    parser.add_argument('--x', default='random', choices=sorted(POLICIES))
+    parser.add_argument('--o', default='random', choices=sorted(POLICIES))
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verify', type=int, default=0, metavar='N',
+                        help='first replay N games through the live rules')
+    args = parser.parse_args()
+
+    if args.verify:
+        print(f'verified {verify(args.mode, args.verify)} games against engine.Rules')
+    stats = simulate(args.mode, args.games, args.x, args.o, args.batch, args.seed)
+    total = stats['games']
+    print(f"{args.mode}: {total} games in {stats['seconds']:.2f}s "
+          f"({stats['games_per_sec']:,.0f} games/sec, {stats['avg_moves']:.2f} moves/game)")
+    for name, count in stats['results'].items():
+        print(f'  {name:>3}: {count / total:7.2%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# Perfect-play solution table for the standard 3x3 board.
+#
+# Every reachable position is solved once by negamax and stored under its
+# canonical form: the smallest (x << 9 | o) over the 8 rotations/reflections
+# of the board. That leaves 765 entries, each holding the value for the side
+# to move (1 win, 0 draw, -1 loss), the number of plies to the result under
+# best play, and a bitmask of the optimal cells in canonical orientation.
+#
+# load_or_build() caches the table as JSON (instance/solution_table.json in
+# the app). The file is generated, not tracked: delete it to rebuild.
+
+import json
+import os
+import random
+
+import engine
+
+RULES = engine.STANDARD
+CELLS = RULES.cells
+
+# The 8 symmetries as cell permutations: cell i maps to PERMS[s][i]
+_GEOMETRY = (
+    lambda r, c: (r, c),
+    lambda r, c: (c, 2 - r),
+    lambda r, c: (2 - r, 2 - c),
+    lambda r, c: (2 - c, r),
+    lambda r, c: (r, 2 - c),
+    lambda r, c: (2 - r, c),
+    lambda r, c: (c, r),
+    lambda r, c: (2 - c, 2 - r),
+)
+PERMS = tuple(
+    tuple(f(*divmod(i, 3))[0] * 3 + f(*divmod(i, 3))[1] for i in range(CELLS))
+    for f in _GEOMETRY
+)
+INVERSE = tuple(tuple(p.index(i) for i in range(CELLS)) for p in PERMS)
+
+
+def _permute_table(perm):
+    table = []
+    for bits in range(1 << CELLS):
+        out = 0
+        for i in range(CELLS):
+            if bits >> i & 1:
+                out |= 1 << perm[i]
+        table.append(out)
+    return tuple(table)
+
+
+# 512-entry lookup per symmetry so transforming a side's bits is one index
+TRANSFORM = tuple(_permute_table(p) for p in PERMS)
+UNTRANSFORM = tuple(_permute_table(p) for p in INVERSE)
+
+
+def canonical(x, o):
+    # Returns (key, symmetry) with key = transformed x << 9 | transformed o
+    best, best_sym = None, 0
+    for s, table in enumerate(TRANSFORM):
+        key = table[x] << CELLS | table[o]
+        if best is None or key < best:
+            best, best_sym = key, s
+    return best, best_sym
+
+
+def _won(own, cell):
+    for m in RULES.cell_windows[cell]:
+        if own & m == m:
+            return True
+    return False
+
+
+def _score(value, distance):
+    # Prefer wins, then the quickest win or the slowest loss
+    return value * (CELLS + 1 - distance) if value else 0
+
+
+def build():
+    table = {}
+
+    def solve(x, o, last_won):
+        key, _ = canonical(x, o)
+        if key in table:
+            return table[key]
+        filled = x | o
+        if last_won:
+            entry = (-1, 0, 0)
+        elif filled == (1 << CELLS) - 1:
+            entry = (0, 0, 0)
+        else:
+            x_to_move = x.bit_count() == o.bit_count()
+            children = []
+            for cell in range(CELLS):
+                if filled >> cell & 1:
+                    continue
+                if x_to_move:
+                    child = solve(x | 1 << cell, o, _won(x | 1 << cell, cell))
+                else:
+                    child = solve(x, o | 1 << cell, _won(o | 1 << cell, cell))
+                children.append((cell, -child[0], child[1] + 1))
+            top = max(_score(v, d) for _, v, d in children)
+            value, distance = next((v, d) for _, v, d in children if _score(v, d) == top)
+            # Optimal cells are stored in canonical orientation
+            _, sym = canonical(x, o)
+            mask = 0
+            for cell, v, d in children:
+                if _score(v, d) == top:
+                    mask |= 1 << PERMS[sym][cell]
+            entry = (value, distance, mask)
+        table[key] = entry
+        return entry
+
+    solve(0, 0, False)
+    return table
+
+
+def load_or_build(path):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                return {int(k): tuple(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            pass
+    table = build()
+    with open(path, 'w') as f:
+        json.dump(table, f)
+    return table
+
+
+def lookup(table, x, o):
+    # (value, distance, optimal cells in the caller's orientation)
+    key, sym = canonical(x, o)
+    value, distance, mask = table[key]
+    inverse = INVERSE[sym]
+    return value, distance, [inverse[i] for i in range(CELLS) if mask >> i & 1]
+
+
+# Chance of playing a random legal move instead of a perfect one
+DIFFICULTY = {'easy': 0.6, 'medium': 0.25, 'hard': 0.0}
+
+
+def choose_move(table, bits, difficulty='hard', rng=random):
+    x, o = bits
+    filled = x | o
+    empty = [i for i in range(CELLS) if not filled >> i & 1]
+    if not empty:
+        return None
+    if rng.random() < DIFFICULTY.get(difficulty, 0.0):
+        return rng.choice(empty)
+    _, _, best = lookup(table, x, o)
+    return rng.choice(best)
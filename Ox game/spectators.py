@@ -0,0 +1,73 @@
+# Spectators of each game, kept apart from its players.
+#
+# A game's players are in its game_id room and its spectators in
+# watch_room(game_id). Players get every move as it happens; spectators get
+# the whole game_update instead, at most once per interval per game however
+# many changes were made in it (the app's spectator task calls take() each
+# interval), so a featured game's watchers cost its players nothing per move.
+#
+# Viewers are counted, not listed: the registry is a sid -> game_id dict and
+# a count per game, so joining, leaving and reading a count are O(1), and a
+# changed count is sent once per interval as viewer_count rather than one
+# spectator_joined per arrival. add and remove take a lock, so counts stay
+# right with OS threads (OX_ASYNC_MODE=threading).
+
+import threading
+
+
+def watch_room(game_id):
+    return f'{game_id}/watch'
+
+
+class Viewers:
+    def __init__(self):
+        self.watching = {}
+        self.counts = {}
+        # Games whose state or viewer count changed since the last take()
+        self.stale = set()
+        self.recounted = set()
+        self.lock = threading.Lock()
+        self.changes = 0
+        self.frames = 0
+
+    def add(self, sid, game_id):
+        with self.lock:
+            self._remove(sid)
+            self.watching[sid] = game_id
+            self.counts[game_id] = self.counts.get(game_id, 0) + 1
+            self.recounted.add(game_id)
+
+    def remove(self, sid):
+        with self.lock:
+            return self._remove(sid)
+
+    def _remove(self, sid):
+        game_id = self.watching.pop(sid, None)
+        if game_id is not None:
+            left = self.counts[game_id] - 1
+            if left:
+                self.counts[game_id] = left
+            else:
+                del self.counts[game_id]
+            self.recounted.add(game_id)
+        return game_id
+
+    def count(self, game_id):
+        return self.counts.get(game_id, 0)
+
+    def changed(self, game_id):
+        # Unwatched games cost a single dict lookup
+        if game_id in self.counts:
+            self.changes += 1
+            self.stale.add(game_id)
+
+    def take(self):
+        with self.lock:
+            stale, recounted = self.stale, self.recounted
+            self.stale, self.recounted = set(), set()
+        self.frames += len(stale)
+        return stale, recounted
+
+    def stats(self):
+        return {'games': len(self.counts), 'viewers': len(self.watching),
+                'changes': self.changes, 'frames': self.frames}
@@ -0,0 +1,449 @@
+# Where games, chat, player stats and connected clients live.
+#
+# Every backend has the same small interface, so the socket handlers and
+# routes never touch a module-level dict directly:
+#
+#   get_game / save_game / delete_game / game_count / game_ids
+#   add_chat / chat_history / clear_chat
+#   record_result / player_stats
+#   add_client / remove_client / client_count
+#   footprint                  approximate bytes the store holds
+#
+# MemoryStore is the single-process behaviour the app has always had: games
+# are live objects and save_game() does nothing. SQLiteStore and RedisStore
+# keep each game as its gamestate.to_state() JSON so that several processes
+# (and restarts) see the same games. They still hold one live Game per id so
+# process-local fields such as an in-flight search survive a reload;
+# get_game() refreshes that object from the stored state.
+#
+# RedisStore talks RESP over a plain socket, so it needs no client package
+# and works against Redis or anything speaking its protocol (see
+# bench/resp_standin.py).
+#
+#   open_store('memory')
+#   open_store('sqlite')                        instance/ox_app.db
+#   open_store('sqlite:///path/to/ox_app.db')
+#   open_store('redis://localhost:6379/0')
+#
+# Each game keeps its last `chat_limit` messages (CHAT_LIMIT by default).
+# MemoryStore holds them in a ChatRing per game, so an append never copies
+# or shifts the log; the durable stores trim on insert.
+#
+# SQLiteStore and RedisStore share one connection between all handlers, so
+# each statement (or RESP command and its reply) runs under a lock made by
+# `lock_factory`. The app passes gamelocks.lock_factory() for its async mode:
+# a RESP round trip yields to the hub, and a threading.Lock held across it
+# would block every green thread.
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+from urllib.parse import urlparse
+
+import gamestate
+
+CHAT_LIMIT = 100
+OUTCOMES = ('wins', 'losses', 'ties')
+
+
+def _empty_stats():
+    return {'wins': 0, 'losses': 0, 'ties': 0, 'games_played': 0}
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+def _sizeof(value, seen):
+    # Deep sys.getsizeof over containers and slotted objects, counting shared
+    # objects (interned strings, the engine's rules) once
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k, seen) + _sizeof(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(v, seen) for v in value)
+    elif hasattr(type(value), '__slots__'):
+        size += sum(_sizeof(getattr(value, name, None), seen) for name in type(value).__slots__)
+    return size
+
+
+class ChatRing:
+    # A game's last `capacity` messages. The slot list grows up to capacity
+    # and from then on each append overwrites the oldest slot
+    __slots__ = ('slots', 'capacity', 'start')
+
+    def __init__(self, capacity):
+        self.slots = []
+        self.capacity = capacity
+        self.start = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def append(self, record):
+        if len(self.slots) < self.capacity:
+            self.slots.append(record)
+        else:
+            self.slots[self.start] = record
+            self.start = (self.start + 1) % self.capacity
+
+    def last(self, limit):
+        # The newest `limit` messages, oldest first
+        slots, size = self.slots, len(self.slots)
+        count = min(limit, size)
+        begin = (self.start + size - count) % size if size else 0
+        end = begin + count
+        if end <= size:
+            return slots[begin:end]
+        return slots[begin:] + slots[:end - size]
+
+
+class MemoryStore:
+    backend = 'memory'
+
+    def __init__(self, chat_limit=CHAT_LIMIT):
+        self.games = {}
+        self.chat_limit = chat_limit
+        self.chat = defaultdict(partial(ChatRing, chat_limit))
+        self.stats = defaultdict(_empty_stats)
+        self.stats_lock = threading.Lock()
+        self.clients = set()
+
+    def get_game(self, game_id):
+        return self.games.get(game_id)
+
+    def save_game(self, game):
+        self.games[game.game_id] = game
+
+    def delete_game(self, game_id):
+        self.games.pop(game_id, None)
+
+    def game_count(self):
+        return len(self.games)
+
+    def game_ids(self):
+        return list(self.games)
+
+    def add_chat(self, game_id, record):
+        self.chat[game_id].append(record)
+
+    def chat_history(self, game_id, limit=CHAT_LIMIT):
+        messages = self.chat.get(game_id)
+        return messages.last(limit) if messages is not None else []
+
+    def clear_chat(self, game_id):
+        self.chat.pop(game_id, None)
+
+    def record_result(self, name, outcome):
+        # A player's games finish under different game locks, so stats need their own
+        with self.stats_lock:
+            stats = self.stats[name]
+            stats[outcome] += 1
+            stats['games_played'] += 1
+
+    def player_stats(self, name):
+        return dict(self.stats.get(name) or _empty_stats())
+
+    def add_client(self, sid):
+        self.clients.add(sid)
+        return len(self.clients)
+
+    def remove_client(self, sid):
+        self.clients.discard(sid)
+        return len(self.clients)
+
+    def client_count(self):
+        return len(self.clients)
+
+    def footprint(self):
+        # Walks every object, so this is for /metrics rather than hot paths
+        seen = set()
+        return sum(_sizeof(part, seen) for part in (self.games, self.chat, self.stats, self.clients))
+
+
+class _LiveGames:
+    # The live Game objects of a durable store, refreshed from stored state
+    def __init__(self):
+        self.live = {}
+
+    def load(self, game_id, raw):
+        if raw is None:
+            self.live.pop(game_id, None)
+            return None
+        state = json.loads(raw)
+        game = self.live.get(game_id)
+        if game is None:
+            game = self.live[game_id] = gamestate.Game.from_state(state)
+        else:
+            game.load_state(state)
+        return game
+
+    def keep(self, game):
+        self.live[game.game_id] = game
+        return _dumps(game.to_state())
+
+
+class SQLiteStore:
+    backend = 'sqlite'
+
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS game_state (
+        game_id VARCHAR(8) PRIMARY KEY,
+        state TEXT NOT NULL,
+        updated_at REAL
+    );
+    CREATE TABLE IF NOT EXISTS chat_message (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        game_id VARCHAR(8) NOT NULL,
+        record TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_chat_message_game_id ON chat_message (game_id, id);
+    CREATE TABLE IF NOT EXISTS player_stats (
+        name VARCHAR(64) PRIMARY KEY,
+        wins INTEGER NOT NULL DEFAULT 0,
+        losses INTEGER NOT NULL DEFAULT 0,
+        ties INTEGER NOT NULL DEFAULT 0,
+        games_played INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS client (
+        sid VARCHAR(64) PRIMARY KEY
+    );
+    '''
+
+    def __init__(self, path, chat_limit=CHAT_LIMIT, lock_factory=threading.Lock):
+        self.path = path
+        self.chat_limit = chat_limit
+        self.lock = lock_factory()
+        # Autocommit; WAL lets other worker processes read while one writes
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        self.games = _LiveGames()
+
+    def _run(self, *statements):
+        # Runs (sql, params) pairs back to back under the lock; returns each one's rows
+        with self.lock:
+            return [self.conn.execute(sql, params).fetchall() for sql, params in statements]
+
+    def _one(self, sql, params=()):
+        rows = self._run((sql, params))[0]
+        return rows[0] if rows else None
+
+    def get_game(self, game_id):
+        row = self._one('SELECT state FROM game_state WHERE game_id = ?', (game_id,))
+        return self.games.load(game_id, row[0] if row else None)
+
+    def save_game(self, game):
+        self._run(('INSERT OR REPLACE INTO game_state (game_id, state, updated_at) VALUES (?, ?, ?)',
+                   (game.game_id, self.games.keep(game), time.time())))
+
+    def delete_game(self, game_id):
+        self.games.live.pop(game_id, None)
+        self._run(('DELETE FROM game_state WHERE game_id = ?', (game_id,)))
+
+    def game_count(self):
+        return self._one('SELECT COUNT(*) FROM game_state')[0]
+
+    def game_ids(self):
+        return [r[0] for r in self._run(('SELECT game_id FROM game_state', ()))[0]]
+
+    def add_chat(self, game_id, record):
+        self._run(('INSERT INTO chat_message (game_id, record) VALUES (?, ?)', (game_id, _dumps(record))),
+                  ('DELETE FROM chat_message WHERE game_id = ? AND id <= ('
+                   'SELECT id FROM chat_message WHERE game_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                   (game_id, game_id, self.chat_limit)))
+
+    def chat_history(self, game_id, limit=CHAT_LIMIT):
+        rows, = self._run(('SELECT record FROM chat_message WHERE game_id = ? ORDER BY id DESC LIMIT ?',
+                           (game_id, limit)))
+        return [json.loads(r[0]) for r in reversed(rows)]
+
+    def clear_chat(self, game_id):
+        self._run(('DELETE FROM chat_message WHERE game_id = ?', (game_id,)))
+
+    def record_result(self, name, outcome):
+        if outcome not in OUTCOMES:
+            raise ValueError(outcome)
+        self._run((f'INSERT INTO player_stats (name, {outcome}, games_played) VALUES (?, 1, 1) '
+                   f'ON CONFLICT(name) DO UPDATE SET {outcome} = {outcome} + 1, '
+                   f'games_played = games_played + 1', (name,)))
+
+    def player_stats(self, name):
+        row = self._one('SELECT wins, losses, ties, games_played FROM player_stats WHERE name = ?', (name,))
+        return dict(zip(('wins', 'losses', 'ties', 'games_played'), row)) if row else _empty_stats()
+
+    def add_client(self, sid):
+        return self._run(('INSERT OR IGNORE INTO client (sid) VALUES (?)', (sid,)),
+                         ('SELECT COUNT(*) FROM client', ()))[1][0][0]
+
+    def remove_client(self, sid):
+        return self._run(('DELETE FROM client WHERE sid = ?', (sid,)),
+                         ('SELECT COUNT(*) FROM client', ()))[1][0][0]
+
+    def client_count(self):
+        return self._one('SELECT COUNT(*) FROM client')[0]
+
+    def footprint(self):
+        # Pages in use, so deleted rows stop counting once their pages are freed
+        (pages,), (free,), (size,) = (rows[0] for rows in self._run(
+            ('PRAGMA page_count', ()), ('PRAGMA freelist_count', ()), ('PRAGMA page_size', ())))
+        return (pages - free) * size
+
+
+class RespError(Exception):
+    pass
+
+
+class RespConnection:
+    # Minimal RESP2 client: commands go out as arrays of bulk strings
+    def __init__(self, host='localhost', port=6379, db=0, timeout=5, lock_factory=threading.Lock):
+        self.lock = lock_factory()
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+        if db:
+            self.execute('SELECT', db)
+
+    @staticmethod
+    def _pack(args):
+        out = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(out)
+
+    def _read(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError('connection closed by server')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RespError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            size = int(rest)
+            if size < 0:
+                return None
+            data = self.reader.read(size + 2)
+            return data[:-2]
+        if kind == b'*':
+            size = int(rest)
+            return None if size < 0 else [self._read() for _ in range(size)]
+        raise RespError(f'bad reply {line!r}')
+
+    def execute(self, *args):
+        # Held from the write until the reply is read, so replies never cross callers
+        with self.lock:
+            self.sock.sendall(self._pack(args))
+            return self._read()
+
+    def pipeline(self, *commands):
+        # Sends every command in one write and reads the replies in order
+        with self.lock:
+            self.sock.sendall(b''.join(self._pack(c) for c in commands))
+            return [self._read() for _ in commands]
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+class RedisStore:
+    backend = 'redis'
+
+    def __init__(self, host='localhost', port=6379, db=0, prefix='ox', chat_limit=CHAT_LIMIT,
+                 lock_factory=threading.Lock):
+        self.conn = RespConnection(host, port, db, lock_factory=lock_factory)
+        self.prefix = prefix
+        self.chat_limit = chat_limit
+        self.games = _LiveGames()
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    def get_game(self, game_id):
+        raw = self.conn.execute('GET', self._key('game', game_id))
+        return self.games.load(game_id, raw)
+
+    def save_game(self, game):
+        self.conn.pipeline(('SET', self._key('game', game.game_id), self.games.keep(game)),
+                           ('SADD', self._key('games'), game.game_id))
+
+    def delete_game(self, game_id):
+        self.games.live.pop(game_id, None)
+        self.conn.pipeline(('DEL', self._key('game', game_id)),
+                           ('SREM', self._key('games'), game_id))
+
+    def game_count(self):
+        return self.conn.execute('SCARD', self._key('games'))
+
+    def game_ids(self):
+        return [m.decode() for m in self.conn.execute('SMEMBERS', self._key('games'))]
+
+    def add_chat(self, game_id, record):
+        key = self._key('chat', game_id)
+        self.conn.pipeline(('RPUSH', key, _dumps(record)), ('LTRIM', key, -self.chat_limit, -1))
+
+    def chat_history(self, game_id, limit=CHAT_LIMIT):
+        return [json.loads(r) for r in self.conn.execute('LRANGE', self._key('chat', game_id), -limit, -1)]
+
+    def clear_chat(self, game_id):
+        self.conn.execute('DEL', self._key('chat', game_id))
+
+    def record_result(self, name, outcome):
+        if outcome not in OUTCOMES:
+            raise ValueError(outcome)
+        key = self._key('stats', name)
+        self.conn.pipeline(('HINCRBY', key, outcome, 1), ('HINCRBY', key, 'games_played', 1))
+
+    def player_stats(self, name):
+        stats = _empty_stats()
+        flat = self.conn.execute('HGETALL', self._key('stats', name))
+        for field, value in zip(flat[::2], flat[1::2]):
+            stats[field.decode()] = int(value)
+        return stats
+
+    def add_client(self, sid):
+        return self.conn.pipeline(('SADD', self._key('clients'), sid), ('SCARD', self._key('clients')))[1]
+
+    def remove_client(self, sid):
+        return self.conn.pipeline(('SREM', self._key('clients'), sid), ('SCARD', self._key('clients')))[1]
+
+    def client_count(self):
+        return self.conn.execute('SCARD', self._key('clients'))
+
+    def footprint(self):
+        # The whole server's used_memory: other data in the same Redis counts too
+        for line in self.conn.execute('INFO', 'memory').decode().splitlines():
+            if line.startswith('used_memory:'):
+                return int(line.split(':', 1)[1])
+        return 0
+
+
+def open_store(url, instance_path='instance', chat_limit=CHAT_LIMIT, lock_factory=threading.Lock):
+    parsed = urlparse(url or 'memory')
+    scheme = parsed.scheme or parsed.path
+    if scheme == 'memory':
+        return MemoryStore(chat_limit)
+    if scheme == 'sqlite':
+        return SQLiteStore(parsed.path if parsed.scheme else os.path.join(instance_path, 'ox_app.db'), chat_limit,
+                           lock_factory)
+    if scheme == 'redis':
+        db = int(parsed.path.lstrip('/') or 0)
+        return RedisStore(parsed.hostname or 'localhost', parsed.port or 6379, db, chat_limit=chat_limit,
+                          lock_factory=lock_factory)
+    raise ValueError(f'Unknown store {url!r}')
@@ -0,0 +1,106 @@
+# Hierarchical timing wheel for many timers that mostly get rescheduled.
+#
+# Time is cut into ticks of `tick` seconds. Level 0 has one slot per tick
+# for the next `slots` ticks; each level above has slots `slots` times as
+# wide, so four levels of 64 cover 64**4 ticks (46 hours at 10 ms). A timer
+# goes in the lowest level whose span reaches its deadline, and when the
+# wheel crosses a level boundary the next slot of that level is cascaded
+# down. schedule() and cancel() are O(1); advancing one tick touches one
+# level-0 slot plus, every `slots` ticks, one slot per higher level, so its
+# cost is independent of how many timers are pending.
+#
+# Each timer is a key (a game_id) with a deadline. Keys are unique:
+# scheduling a key again moves it. advance(now) returns the keys whose
+# deadline tick has passed; deadlines are rounded up to a tick, so a timer
+# never fires early and at most one tick late.
+#
+# A lock makes schedule, cancel and advance safe from several OS threads
+# (OX_ASYNC_MODE=threading). Nothing yields while it is held, so on green
+# threads it is never contended.
+
+import math
+import threading
+
+
+class TimerWheel:
+    def __init__(self, now, tick=0.01, slots=64, levels=4):
+        self.tick = tick
+        self.bits = slots.bit_length() - 1
+        if 1 << self.bits != slots:
+            raise ValueError('slots must be a power of two')
+        self.mask = slots - 1
+        self.levels = levels
+        self.span = 1 << (self.bits * levels)
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.current = int(now / tick)
+        # key -> the slot dict holding it, for O(1) cancel
+        self._where = {}
+        self.lock = threading.Lock()
+        self.fired = 0
+        self.cascaded = 0
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def schedule(self, key, deadline):
+        with self.lock:
+            self._cancel(key)
+            self._place(key, max(math.ceil(deadline / self.tick), self.current + 1))
+
+    def cancel(self, key):
+        with self.lock:
+            self._cancel(key)
+
+    def _cancel(self, key):
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            del slot[key]
+
+    def _place(self, key, due):
+        # Deadlines past the top level's reach sit in its last slot and are
+        # re-placed each time that slot cascades
+        delta = min(due - self.current, self.span - 1)
+        level = 0
+        while delta >> (self.bits * (level + 1)):
+            level += 1
+        at = self.current + delta
+        slot = self.wheels[level][(at >> (self.bits * level)) & self.mask]
+        slot[key] = due
+        self._where[key] = slot
+
+    def advance(self, now):
+        with self.lock:
+            return self._advance(now)
+
+    def _advance(self, now):
+        # The epsilon keeps float error in now / tick from costing a whole tick
+        target = int(now / self.tick + 1e-6)
+        expired = []
+        while self.current < target:
+            self.current += 1
+            # Cascade from the highest level whose boundary this tick crosses
+            top = 0
+            while top + 1 < self.levels and not self.current & ((1 << (self.bits * (top + 1))) - 1):
+                top += 1
+            for level in range(top, 0, -1):
+                slot = self.wheels[level][(self.current >> (self.bits * level)) & self.mask]
+                if slot:
+                    pending = list(slot.items())
+                    slot.clear()
+                    self.cascaded += len(pending)
+                    for key, due in pending:
+                        self._place(key, due)
+            slot = self.wheels[0][self.current & self.mask]
+            if slot:
+                for key in slot:
+                    del self._where[key]
+                expired.extend(slot)
+                slot.clear()
+        self.fired += len(expired)
+        return expired
+
+    def stats(self):
+        return {'pending': len(self._where), 'fired': self.fired, 'cascaded': self.cascaded}
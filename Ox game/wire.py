@@ -0,0 +1,61 @@
+# Socket.IO payload encoding.
+#
+# Passed to SocketIO as its json module. Arguments wrapped in Encoded are
+# already JSON text and are spliced into the packet as-is, so a snapshot
+# encoded once can be sent to a whole room and to every later request_state
+# without being serialized again. Everything else goes through the stdlib.
+#
+# Clients may negotiate MessagePack instead: their payloads travel as
+# Socket.IO binary attachments holding msgpack bytes, and they sit in a
+# twin of every room (`room/msgpack`) so one emit per format reaches
+# everybody. Without the msgpack package everyone gets JSON.
+
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'json'
+BINARY = 'msgpack'
+
+
+class Encoded(str):
+    # A JSON document that must not be encoded a second time
+    __slots__ = ()
+
+
+def encode(value):
+    return Encoded(json.dumps(value, separators=(',', ':')))
+
+
+def dumps(obj, **kwargs):
+    # Socket.IO encodes an event as the list [event, *args]
+    if type(obj) is list and any(type(v) is Encoded for v in obj):
+        return '[' + ','.join(
+            v if type(v) is Encoded else json.dumps(v, **kwargs) for v in obj) + ']'
+    return json.dumps(obj, **kwargs)
+
+
+def loads(s, **kwargs):
+    return json.loads(s, **kwargs)
+
+
+def negotiate(requested):
+    return BINARY if requested == BINARY and msgpack is not None else JSON
+
+
+def binary_room(room):
+    return f'{room}/{BINARY}'
+
+
+def pack(value):
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def incoming(data):
+    # Event arguments from binary clients arrive as msgpack bytes
+    if isinstance(data, (bytes, bytearray)) and msgpack is not None:
+        return msgpack.unpackb(data, raw=False)
+    return data